@@ -0,0 +1,163 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import math
+import threading
+import time
+
+# Admission control for CPU-bound work. BoundedExecutor runs blocking calls
+# on a small thread pool so the event loop stays free to answer other
+# requests, and admits at most concurrency running plus queue_size waiting
+# calls; past that, run() raises Overloaded straight away so the client
+# can be told to come back later instead of queueing without bound.
+#
+# A slot is only given back when its call has finished (or was cancelled
+# before it started), so abandoned requests whose work is still running
+# keep counting against the limit.
+#
+# Work that makes several calls one after another, such as a streamed
+# response, can reserve a single slot for all of them.
+#
+# The calls can also run on a process pool, given as a function returning
+# it so the pool is still created on first use. AdmissionGate bounds work
+# that isn't a single call, such as a streamed batch that feeds a pool
+# item by item.
+
+class Overloaded(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Busy, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+def _timed(fn, args):
+    # Module level so that process pools can pickle it
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+class BoundedExecutor:
+    def __init__(self, concurrency, queue_size, name="cpu", pool=None):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.admitted = 0
+        self.rejected = 0
+        # Moving average of how long a call takes, for Retry-After
+        self.service_time = 0.05
+        self._pool = pool
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=name) if pool is None else None
+        self._lock = threading.Lock()
+
+    def retry_after(self):
+        # Seconds until the current backlog should have cleared
+        return max(1, math.ceil(self.admitted * self.service_time / self.concurrency))
+
+    def _admit(self):
+        with self._lock:
+            if self.admitted >= self.concurrency + self.queue_size:
+                self.rejected += 1
+                raise Overloaded(self.retry_after())
+            self.admitted += 1
+
+    def _record(self, future):
+        if not future.cancelled() and future.exception() is None:
+            with self._lock:
+                self.service_time += 0.1 * (future.result()[1] - self.service_time)
+
+    def _release(self, future):
+        with self._lock:
+            self.admitted -= 1
+        self._record(future)
+
+    def submit(self, fn, *args):
+        # Queues fn(*args) or raises Overloaded. Returns the concurrent
+        # future of (result, seconds the call took); for work nobody waits on
+        self._admit()
+        try:
+            future = (self._executor or self._pool()).submit(_timed, fn, args)
+        except BaseException:
+            with self._lock:
+                self.admitted -= 1
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn, *args):
+        result, _ = await asyncio.wrap_future(self.submit(fn, *args))
+        return result
+
+    def reserve(self):
+        # Admits work that makes its calls one after another over a while,
+        # such as a streamed response, as a single slot, or raises
+        # Overloaded. Returns the function that gives the slot back, safe to
+        # call more than once; the calls go through run_reserved()
+        self._admit()
+        released = False
+
+        def release():
+            nonlocal released
+            with self._lock:
+                if not released:
+                    released = True
+                    self.admitted -= 1
+
+        return release
+
+    async def run_reserved(self, fn, *args):
+        # A call of reserved work, which already holds its slot
+        future = (self._executor or self._pool()).submit(_timed, fn, args)
+        future.add_done_callback(self._record)
+        result, _ = await asyncio.wrap_future(future)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "queue_size": self.queue_size,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "service_time": round(self.service_time, 4),
+            }
+
+    def shutdown(self):
+        # A pool passed in belongs to the caller, who shuts it down
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+class AdmissionGate:
+    # At most limit holders at a time; enter() returns a release function,
+    # safe to call more than once, or raises Overloaded
+    def __init__(self, limit):
+        self.limit = limit
+        self.admitted = 0
+        self.rejected = 0
+        # Moving average of how long a holder keeps its slot, for Retry-After
+        self.hold_time = 1.0
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            if self.admitted >= self.limit:
+                self.rejected += 1
+                raise Overloaded(max(1, math.ceil(self.hold_time / self.limit)))
+            self.admitted += 1
+        start = time.perf_counter()
+        released = False
+
+        def release():
+            nonlocal released
+            with self._lock:
+                if released:
+                    return
+                released = True
+                self.admitted -= 1
+                self.hold_time += 0.1 * (time.perf_counter() - start - self.hold_time)
+
+        return release
+
+    def stats(self):
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "hold_time": round(self.hold_time, 4),
+            }
@@ -1,12 +1,59 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Body, Depends, Header
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, EmailStr
-from typing import List, Optional, Union
-from datetime import date, datetime
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, EmailStr, ValidationError
+from typing import Any, Dict, List, Optional, Union
+from datetime import date, datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from functools import cached_property
+from html import escape
+import asyncio
+import hashlib
+import heapq
+import itertools
+import hmac
+import json
+import logging
+import math
+import multiprocessing
+import os
+import re
+import time
+import uuid
+import zipfile
+import numpy as np
 import uvicorn
 
-app = FastAPI(title="Learnavia - Attractive Resume Generator API")
+from admission import AdmissionGate, BoundedExecutor, Overloaded
+from cache import LRUCache
+from compression import PrefixGzip
+from cooccurrence import CooccurrenceModel
+from minify import minify_css, minify_html
+from semantic import SemanticIndex
+from store import PortfolioStore
+from profiling import ProfileStore, ProfilingMiddleware
+import compression
+import fastcodec
+import metrics
+import pdf_resume
+import profiling
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app):
+    # The hooks are defined further down, next to what they start and stop
+    start_catalog_watcher()
+    try:
+        yield
+    finally:
+        stop_catalog_watcher()
+        shutdown_render_pool()
+
+app = FastAPI(title="Learnavia - Attractive Resume Generator API", lifespan=lifespan)
+app.router.route_class = metrics.MetricsRoute
 
 # CORS setup
 app.add_middleware(
@@ -15,7 +62,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Page"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
 
 class Activity(BaseModel):
     id: Optional[str] = None
@@ -52,6 +101,7 @@ class RecommendationRequest(BaseModel):
     profile: StudentProfile
     activities: Optional[List[Activity]] = []
     num_recs: Optional[int] = 6
+    mode: Optional[str] = "tags"
 
 # Helper function to get layout styles
 def get_layout_style(layout):
@@ -583,271 +633,1743 @@ def get_layout_style(layout):
         }
         """
 
-def generate_html_portfolio(profile: StudentProfile, activities: List[Activity], layout="standard"):
-    
-    if layout == "modern":
-        # MODERN LAYOUT - Two column professional design
-        activities_html = ""
-        for activity in activities:
-            date_str = str(activity.date) if activity.date else "N/A"
-            tags = " ".join([f'<span class="activity-tag">{tag}</span>' for tag in (activity.tags or [])])
-            activities_html += f"""
-            <div class="activity-card">
-                <h4>{activity.title}</h4>
-                <div class="activity-meta">{activity.type.upper()} • {date_str}</div>
-                {f'<p style="margin: 10px 0; color: #555;">{activity.description}</p>' if activity.description else ''}
-                {f'<div>{tags}</div>' if tags.strip() else ''}
-            </div>
-            """
-        
-        skills_html = " ".join([f'<span class="skill-badge">{skill}</span>' for skill in (profile.skills or [])])
-        
-        html = f"""
+# Layout templates are compiled once at import. A template is static text plus
+# slots and sections:
+#   {{name}}                  value, HTML-escaped
+#   {{&name}}                 value inserted as-is (already-rendered markup)
+#   {{#name}}...{{/name}}     rendered only when the value is truthy
+#   {{^name}}...{{/name}}     rendered only when the value is falsy
+#   {{*name}}...{{/name}}     rendered once per item ({{.}}, escaped), space separated
+# Compile-time constants such as the layout CSS are folded into the static
+# text, and each template becomes a plain Python function that escapes all of
+# its values in one pass and joins them with the pre-built text segments.
+_TAG_RE = re.compile(r"\{\{([#^*/&]?)([\w.]+)\}\}")
+
+def escape_html(value):
+    if value.__class__ is not str:
+        value = str(value)
+    if "&" in value or "<" in value or ">" in value or '"' in value or "'" in value:
+        return escape(value)
+    return value
+
+def escape_all(values):
+    # Escape a group of values with one scan over their concatenation. Almost
+    # all resume text is plain, so the common case returns the values as-is.
+    try:
+        text = "\0".join(values)
+    except TypeError:
+        # Numbers such as year and GPA are formatted the way an f-string would
+        values = [value if value.__class__ is str else str(value) for value in values]
+        text = "\0".join(values)
+    if not ("&" in text or "<" in text or ">" in text or '"' in text or "'" in text):
+        return values
+    escaped = escape(text).split("\0")
+    if len(escaped) != len(values):
+        return [escape_html(value) for value in values]
+    return escaped
+
+class Template:
+    def __init__(self, source, params=None, minify=False, **static):
+        # With params, render() takes the values positionally in that order
+        # instead of as a dict, for small templates rendered many times over.
+        # With minify, the source's whitespace is stripped before parsing.
+        self.source = source
+        self.params = params
+        self.minify = minify
+        self.static = static
+        self.nodes = self._parse(minify_html(source) if minify else source, static)
+        self.render = self._compile(self.nodes, params)
+
+    def with_static(self, **static):
+        # The same template with some static values replaced
+        return Template(self.source, self.params, self.minify, **{**self.static, **static})
+
+    @property
+    def static_prefix(self):
+        # The text every rendering starts with
+        prefix = []
+        for node in self.nodes:
+            if not isinstance(node, str):
+                break
+            prefix.append(node)
+        return "".join(prefix)
+
+    @staticmethod
+    def _parse(source, static):
+        # Nodes are text strings or (kind, name, children) tuples, where kind
+        # is "" (escaped), "&", "#", "^" or "*"
+        root = []
+        stack = [("", None, root)]
+        pos = 0
+        for match in _TAG_RE.finditer(source):
+            stack[-1][2].append(source[pos:match.start()])
+            pos = match.end()
+            kind, name = match.groups()
+            if kind == "/":
+                if stack[-1][1] != name:
+                    raise ValueError(f"Unexpected {{{{/{name}}}}} in template")
+                stack.pop()
+            elif kind in ("#", "^", "*"):
+                section = (kind, name, [])
+                stack[-1][2].append(section)
+                stack.append(section)
+            elif name in static:
+                stack[-1][2].append(static[name])
+            else:
+                stack[-1][2].append((kind, name, None))
+        if len(stack) > 1:
+            raise ValueError(f"Unclosed {{{{{stack[-1][0]}{stack[-1][1]}}}}} in template")
+        stack[-1][2].append(source[pos:])
+        return root
+
+    @staticmethod
+    def _compile(nodes, params):
+        escaped = []
+        lists = []
+        conditions = set()
+
+        def ref(name):
+            return f"_{name}" if params else f"values[{name!r}]"
+
+        def collect(nodes):
+            for node in nodes:
+                if isinstance(node, str):
+                    continue
+                kind, name, children = node
+                if kind == "" and name != "." and name not in escaped:
+                    escaped.append(name)
+                elif kind == "*" and name not in lists:
+                    lists.append(name)
+                if kind in ("#", "^"):
+                    conditions.add(name)
+                if children:
+                    collect(children)
+
+        def emit(nodes, item=None):
+            pieces = []
+            for node in nodes:
+                if isinstance(node, str):
+                    if not node:
+                        continue
+                    if pieces and pieces[-1][0] == "text":
+                        pieces[-1] = ("text", pieces[-1][1] + node)
+                    else:
+                        pieces.append(("text", node))
+                    continue
+                kind, name, children = node
+                if name == ".":
+                    expr = item
+                elif kind == "":
+                    expr = f"escaped[{escaped.index(name)}]"
+                elif kind == "&":
+                    expr = ref(name)
+                elif kind == "#":
+                    expr = f"({emit(children, item)} if {ref(name)} else '')"
+                elif kind == "^":
+                    expr = f"('' if {ref(name)} else {emit(children, item)})"
+                else:
+                    expr = emit_list(lists.index(name), children)
+                pieces.append(("expr", expr))
+            exprs = [repr(value) if kind == "text" else value for kind, value in pieces]
+            if not exprs:
+                return "''"
+            if len(exprs) == 1:
+                return exprs[0]
+            return f"''.join(({', '.join(exprs)}))"
+
+        def emit_list(index, children):
+            body = [child for child in children if child != ""]
+            if (len(body) == 3 and isinstance(body[0], str) and isinstance(body[2], str)
+                    and body[1][1] == "."):
+                # text{{.}}text: join the items with the repeated text in between
+                head, tail = body[0], body[2]
+                return f"({head!r} + {tail + ' ' + head!r}.join(_items{index}) + {tail!r} if _items{index} else '')"
+            return f"' '.join([{emit(children, '_item')} for _item in _items{index}])"
+
+        collect(nodes)
+        lines = [f"def render({', '.join(f'_{name}' for name in params) if params else 'values'}):"]
+        for index, name in enumerate(lists):
+            lines.append(f"    _list{index} = {ref(name)} or ()")
+        scalars = [f"{ref(name)} or ''" if name in conditions else ref(name) for name in escaped]
+        spread = [f"*_list{index}" for index in range(len(lists))]
+        lines.append(f"    escaped = escape_all(({''.join(expr + ', ' for expr in scalars + spread)}))")
+        offset = str(len(escaped))
+        for index in range(len(lists)):
+            end = f"{offset} + len(_list{index})"
+            lines.append(f"    _items{index} = escaped[{offset}:{end}]")
+            offset = end
+        lines.append(f"    return {emit(nodes)}")
+        namespace = {"escape_all": escape_all}
+        exec("\n".join(lines), namespace)
+        return namespace["render"]
+
+# Templates and CSS are minified when they're built (MINIFY_HTML=0 keeps
+# them as written, for reading the output)
+MINIFY_HTML = os.environ.get("MINIFY_HTML", "1") == "1"
+
+# A layout's stylesheet is either inlined in the page, which keeps
+# downloaded and offline copies self-contained, or linked from
+# /static/layout under a name carrying a hash of its contents
+def layout_css(layout, minify=MINIFY_HTML):
+    css = "* { margin: 0; padding: 0; box-sizing: border-box; }\n                " + get_layout_style(layout)
+    return minify_css(css) if minify else css
+
+def inline_stylesheet(layout, minify=MINIFY_HTML):
+    if minify:
+        return f"<style>{layout_css(layout, minify)}</style>"
+    return f"<style>\n                {layout_css(layout, minify)}\n            </style>"
+
+# Activity cards are rendered once per activity, so they take positional values
+CARD_PARAMS = ("title", "type", "date", "description", "tags")
+
+# MODERN LAYOUT - Two column professional design
+MODERN_PAGE = Template("""
         <!DOCTYPE html>
         <html>
         <head>
-            <title>{profile.name}</title>
             <meta name="viewport" content="width=device-width, initial-scale=1.0">
             <link href="https://fonts.googleapis.com/css2?family=Poppins:wght@400;500;600;700;800&display=swap" rel="stylesheet">
-            <style>
-                * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-                {get_layout_style("modern")}
-            </style>
+            {{&stylesheet}}
+            <title>{{name}}</title>
         </head>
         <body>
             <div class="container">
                 <div class="sidebar">
-                    <div class="name">{profile.name}</div>
-                    <div class="title">{profile.department or "Computer Science"}</div>
+                    <div class="name">{{name}}</div>
+                    <div class="title">{{#department}}{{department}}{{/department}}{{^department}}Computer Science{{/department}}</div>
                     
                     <div class="sidebar-section">
                         <h3>Contact</h3>
-                        {f'<div class="sidebar-item">{profile.email}</div>' if profile.email else ''}
-                        {f'<div class="sidebar-item">{profile.phone}</div>' if profile.phone else ''}
-                        {f'<div class="sidebar-item">{profile.college}</div>' if profile.college else ''}
+                        {{#email}}<div class="sidebar-item">{{email}}</div>{{/email}}
+                        {{#phone}}<div class="sidebar-item">{{phone}}</div>{{/phone}}
+                        {{#college}}<div class="sidebar-item">{{college}}</div>{{/college}}
                     </div>
                     
                     <div class="sidebar-section">
                         <h3>Education</h3>
-                        {f'<div class="sidebar-item">Year {profile.year}</div>' if profile.year else ''}
-                        {f'<div class="sidebar-item">GPA: {profile.gpa}</div>' if profile.gpa else ''}
+                        {{#year}}<div class="sidebar-item">Year {{year}}</div>{{/year}}
+                        {{#gpa}}<div class="sidebar-item">GPA: {{gpa}}</div>{{/gpa}}
                     </div>
                     
-                    {f'<div class="sidebar-section"><h3>Skills</h3><div>{skills_html}</div></div>' if profile.skills else ''}
+                    {{&skills}}
                 </div>
                 
                 <div class="main-content">
-                    {f'<div class="content-section"><h2 class="section-title">About Me</h2><p style="line-height: 1.8; color: #555;">{profile.summary}</p></div>' if profile.summary else ''}
+                    {{#summary}}<div class="content-section"><h2 class="section-title">About Me</h2><p style="line-height: 1.8; color: #555;">{{summary}}</p></div>{{/summary}}
                     
-                    {f'<div class="content-section"><h2 class="section-title">Activities & Experience</h2>{activities_html}</div>' if activities else ''}
+                    {{#activities}}<div class="content-section"><h2 class="section-title">Activities & Experience</h2>{{&activities}}</div>{{/activities}}
                     
                     <div style="text-align: center; color: #95a5a6; margin-top: 30px; font-size: 0.9em;">
-                        Resume generated on {datetime.now().strftime('%B %d, %Y')}
+                        Resume generated on {{generated_on}}
                     </div>
                 </div>
             </div>
         </body>
         </html>
-        """
-        return html
-        
-    elif layout == "creative":
-        # CREATIVE LAYOUT - Unique sidebar design with creative elements
-        activities_html = ""
-        for activity in activities:
-            date_str = str(activity.date) if activity.date else "N/A"
-            tags = " ".join([f'<span class="creative-tag">{tag}</span>' for tag in (activity.tags or [])])
-            activities_html += f"""
-            <div class="activity-creative">
-                <h4>{activity.title}</h4>
-                <div class="meta"><span class="timeline-dot"></span>{activity.type.upper()} • {date_str}</div>
-                {f'<p class="description">{activity.description}</p>' if activity.description else ''}
-                {f'<div>{tags}</div>' if tags.strip() else ''}
+        """, minify=MINIFY_HTML, stylesheet=inline_stylesheet("modern"))
+
+MODERN_CARD = Template("""
+            <div class="activity-card">
+                <h4>{{title}}</h4>
+                <div class="activity-meta">{{type}} • {{date}}</div>
+                {{#description}}<p style="margin: 10px 0; color: #555;">{{description}}</p>{{/description}}
+                {{#tags}}<div>{{*tags}}<span class="activity-tag">{{.}}</span>{{/tags}}</div>{{/tags}}
             </div>
-            """
-        
-        skills_html = " ".join([f'<span class="skill-pill">{skill}</span>' for skill in (profile.skills or [])])
-        
-        html = f"""
+            """, params=CARD_PARAMS, minify=MINIFY_HTML)
+
+MODERN_SKILLS = Template("""{{#skills}}<div class="sidebar-section"><h3>Skills</h3><div>{{*skills}}<span class="skill-badge">{{.}}</span>{{/skills}}</div></div>{{/skills}}""", params=("skills",), minify=MINIFY_HTML)
+
+# CREATIVE LAYOUT - Unique sidebar design with creative elements
+CREATIVE_PAGE = Template("""
         <!DOCTYPE html>
         <html>
         <head>
-            <title>{profile.name}</title>
             <meta name="viewport" content="width=device-width, initial-scale=1.0">
             <link href="https://fonts.googleapis.com/css2?family=Poppins:wght@400;500;600;700;800&display=swap" rel="stylesheet">
-            <style>
-                * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-                {get_layout_style("creative")}
-            </style>
+            {{&stylesheet}}
+            <title>{{name}}</title>
         </head>
         <body>
             <div class="container">
                 <div class="creative-sidebar">
                     <div class="profile-image-placeholder">👤</div>
-                    <div class="name">{profile.name}</div>
-                    <div class="title">{profile.department or "Computer Science"}{" at " + profile.college if profile.college else ""}</div>
+                    <div class="name">{{name}}</div>
+                    <div class="title">{{#department}}{{department}}{{/department}}{{^department}}Computer Science{{/department}}{{#college}} at {{college}}{{/college}}</div>
                     
                     <div class="creative-divider"></div>
                     
                     <div class="creative-section">
                         <h3>Contact</h3>
                         <ul class="contact-list">
-                            {f'<li><div class="contact-icon">📧</div><span>{profile.email}</span></li>' if profile.email else ''}
-                            {f'<li><div class="contact-icon">📱</div><span>{profile.phone}</span></li>' if profile.phone else ''}
-                            {f'<li><div class="contact-icon">🎓</div><span>Year {profile.year}</span></li>' if profile.year else ''}
-                            {f'<li><div class="contact-icon">📊</div><span>GPA: {profile.gpa}</span></li>' if profile.gpa else ''}
+                            {{#email}}<li><div class="contact-icon">📧</div><span>{{email}}</span></li>{{/email}}
+                            {{#phone}}<li><div class="contact-icon">📱</div><span>{{phone}}</span></li>{{/phone}}
+                            {{#year}}<li><div class="contact-icon">🎓</div><span>Year {{year}}</span></li>{{/year}}
+                            {{#gpa}}<li><div class="contact-icon">📊</div><span>GPA: {{gpa}}</span></li>{{/gpa}}
                         </ul>
                     </div>
                     
-                    {f'<div class="creative-divider"></div><div class="creative-section"><h3>Skills</h3><div>{skills_html}</div></div>' if profile.skills else ''}
+                    {{&skills}}
                 </div>
                 
                 <div class="creative-main">
-                    {f'<div class="creative-header"><h2>Hello! 👋</h2><p>{profile.summary}</p></div>' if profile.summary else ''}
+                    {{#summary}}<div class="creative-header"><h2>Hello! 👋</h2><p>{{summary}}</p></div>{{/summary}}
                     
-                    {f'<div class="content-block"><h2 class="block-title">Experience & Activities</h2>{activities_html}</div>' if activities else ''}
+                    {{#activities}}<div class="content-block"><h2 class="block-title">Experience & Activities</h2>{{&activities}}</div>{{/activities}}
                     
                     <div style="text-align: center; color: #95a5a6; margin-top: 40px; font-size: 0.9em;">
-                        ✨ Resume generated on {datetime.now().strftime('%B %d, %Y')} ✨
+                        ✨ Resume generated on {{generated_on}} ✨
                     </div>
                 </div>
             </div>
         </body>
         </html>
-        """
-        return html
-        
-    else:  # STANDARD LAYOUT 
-        activities_html = ""
-        for activity in activities:
-            date_str = str(activity.date) if activity.date else "N/A"
-            tags = " ".join([f'<span class="tag">{tag}</span>' for tag in (activity.tags or [])])
-            activities_html += f"""
-            <div class="activity-item">
-                <h4>{activity.title}</h4>
-                <p><strong>{activity.type.upper()}</strong> • {date_str}</p>
-                {f'<p>{activity.description}</p>' if activity.description else ''}
-                {f'<div style="margin-top: 8px;">{tags}</div>' if tags.strip() else ''}
+        """, minify=MINIFY_HTML, stylesheet=inline_stylesheet("creative"))
+
+CREATIVE_CARD = Template("""
+            <div class="activity-creative">
+                <h4>{{title}}</h4>
+                <div class="meta"><span class="timeline-dot"></span>{{type}} • {{date}}</div>
+                {{#description}}<p class="description">{{description}}</p>{{/description}}
+                {{#tags}}<div>{{*tags}}<span class="creative-tag">{{.}}</span>{{/tags}}</div>{{/tags}}
             </div>
-            """
-        
-        skills_html = " ".join([f'<span class="skill-tag">{skill}</span>' for skill in (profile.skills or [])])
-        
-        html = f"""
+            """, params=CARD_PARAMS, minify=MINIFY_HTML)
+
+CREATIVE_SKILLS = Template("""{{#skills}}<div class="creative-divider"></div><div class="creative-section"><h3>Skills</h3><div>{{*skills}}<span class="skill-pill">{{.}}</span>{{/skills}}</div></div>{{/skills}}""", params=("skills",), minify=MINIFY_HTML)
+
+# STANDARD LAYOUT - Simple, traditional format
+STANDARD_PAGE = Template("""
         <!DOCTYPE html>
         <html>
         <head>
-            <title>{profile.name}</title>
             <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <style>
-                * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-                {get_layout_style("standard")}
-            </style>
+            {{&stylesheet}}
+            <title>{{name}}</title>
         </head>
         <body>
             <div class="container">
                 <div class="header">
-                    <h1 class="name">{profile.name}</h1>
-                    <p class="title">{profile.department or "cse"}{" at " + profile.college if profile.college else ""}</p>
+                    <h1 class="name">{{name}}</h1>
+                    <p class="title">{{#department}}{{department}}{{/department}}{{^department}}cse{{/department}}{{#college}} at {{college}}{{/college}}</p>
                     <div class="contact-info">
-                        {f'<div class="contact-item">📧 {profile.email}</div>' if profile.email else ''}
-                        {f'<div class="contact-item">📱 {profile.phone}</div>' if profile.phone else ''}
-                        {f'<div class="contact-item">🎓 Year {profile.year}</div>' if profile.year else ''}
-                        {f'<div class="contact-item">📊 GPA: {profile.gpa}</div>' if profile.gpa else ''}
+                        {{#email}}<div class="contact-item">📧 {{email}}</div>{{/email}}
+                        {{#phone}}<div class="contact-item">📱 {{phone}}</div>{{/phone}}
+                        {{#year}}<div class="contact-item">🎓 Year {{year}}</div>{{/year}}
+                        {{#gpa}}<div class="contact-item">📊 GPA: {{gpa}}</div>{{/gpa}}
                     </div>
                 </div>
                 
                 <div class="content">
-                    {f'<div class="section"><h2 class="section-title">About</h2><p>{profile.summary}</p></div>' if profile.summary else ''}
+                    {{#summary}}<div class="section"><h2 class="section-title">About</h2><p>{{summary}}</p></div>{{/summary}}
                     
-                    {f'<div class="section"><h2 class="section-title">Skills</h2><div>{skills_html}</div></div>' if profile.skills else ''}
+                    {{&skills}}
                     
-                    {f'<div class="section"><h2 class="section-title">Activities</h2>{activities_html}</div>' if activities else ''}
+                    {{#activities}}<div class="section"><h2 class="section-title">Activities</h2>{{&activities}}</div>{{/activities}}
                     
                     <div class="section">
                         <p style="text-align: center; color: #666; margin-top: 30px; font-size: 0.9em;">
-                            ✨ Resume generated on {datetime.now().strftime('%B %d, %Y')} ✨
+                            ✨ Resume generated on {{generated_on}} ✨
                         </p>
                     </div>
                 </div>
             </div>
         </body>
         </html>
-        """
-        return html
+        """, minify=MINIFY_HTML, stylesheet=inline_stylesheet("standard"))
+
+STANDARD_CARD = Template("""
+            <div class="activity-item">
+                <h4>{{title}}</h4>
+                <p><strong>{{type}}</strong> • {{date}}</p>
+                {{#description}}<p>{{description}}</p>{{/description}}
+                {{#tags}}<div style="margin-top: 8px;">{{*tags}}<span class="tag">{{.}}</span>{{/tags}}</div>{{/tags}}
+            </div>
+            """, params=CARD_PARAMS, minify=MINIFY_HTML)
+
+STANDARD_SKILLS = Template("""{{#skills}}<div class="section"><h2 class="section-title">Skills</h2><div>{{*skills}}<span class="skill-tag">{{.}}</span>{{/skills}}</div></div>{{/skills}}""", params=("skills",), minify=MINIFY_HTML)
+
+LAYOUT_TEMPLATES = {
+    "standard": (STANDARD_PAGE, STANDARD_CARD),
+    "modern": (MODERN_PAGE, MODERN_CARD),
+    "creative": (CREATIVE_PAGE, CREATIVE_CARD),
+}
+
+# Skills blocks are rendered apart from the page so they can be cached with
+# the activity cards
+SKILLS_TEMPLATES = {
+    "standard": STANDARD_SKILLS,
+    "modern": MODERN_SKILLS,
+    "creative": CREATIVE_SKILLS,
+}
+
+LAYOUT_CSS = {layout: layout_css(layout).encode() for layout in LAYOUT_TEMPLATES}
+STYLESHEET_PATHS = {
+    layout: f"/static/layout/{layout}.{hashlib.sha256(css).hexdigest()[:16]}.css"
+    for layout, css in LAYOUT_CSS.items()
+}
+LINKED_PAGES = {
+    layout: page.with_static(stylesheet=f'<link rel="stylesheet" href="{STYLESHEET_PATHS[layout]}">')
+    for layout, (page, _) in LAYOUT_TEMPLATES.items()
+}
+
+def resolve_layout(layout):
+    return layout if layout in LAYOUT_TEMPLATES else "standard"
+
+def page_template(layout, inline_css=True):
+    return LAYOUT_TEMPLATES[layout][0] if inline_css else LINKED_PAGES[layout]
+
+# The "Resume generated on" footer only changes at midnight, so the formatted
+# date is kept until the next local day starts
+_generated_on = ("", 0.0)
+
+def generated_on():
+    global _generated_on
+    text, expires = _generated_on
+    if time.time() >= expires:
+        now = datetime.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        text = now.strftime('%B %d, %Y')
+        _generated_on = (text, midnight.timestamp())
+    return text
+
+def render_activity(card: Template, activity: Activity):
+    return card.render(
+        activity.title,
+        activity.type.upper(),
+        str(activity.date) if activity.date else "N/A",
+        activity.description,
+        activity.tags,
+    )
+
+# Rendered activity cards and skills blocks. A student's portfolio usually
+# changes by one activity at a time, so a re-render finds all the other
+# cards here and only renders the new one. Keys are the layout plus the
+# fields the fragment is rendered from; a tuple key hashes and compares its
+# contents, which is exact and cheaper than a digest (hashing a card costs
+# more than rendering it). The key holds on to the activity's text as well,
+# so each entry is counted at twice the size of its html.
+FRAGMENT_CACHE_MAX_BYTES = int(os.environ.get("FRAGMENT_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+fragment_cache = LRUCache(FRAGMENT_CACHE_MAX_BYTES, sizeof=lambda html: 2 * len(html))
+
+def activity_fragment_key(layout, activity: Activity):
+    return (
+        layout,
+        activity.id,
+        activity.title,
+        activity.type,
+        activity.date,
+        activity.description,
+        tuple(activity.tags) if activity.tags else None,
+    )
 
-@app.post("/generate_portfolio")
-async def generate_portfolio(req: PortfolioRequest):
+def cached_activity(layout, card: Template, activity: Activity):
+    key = activity_fragment_key(layout, activity)
+    html = fragment_cache.get(key)
+    if html is None:
+        html = render_activity(card, activity)
+        fragment_cache.set(key, html)
+    return html
+
+def cached_skills(layout, skills):
+    if not skills:
+        return ""
+    key = (layout, "skills", tuple(skills))
+    html = fragment_cache.get(key)
+    if html is None:
+        html = SKILLS_TEMPLATES[layout].render(skills)
+        fragment_cache.set(key, html)
+    return html
+
+def portfolio_values(profile: StudentProfile, activities_html, layout="standard"):
+    return {
+        "name": profile.name,
+        "department": profile.department,
+        "college": profile.college,
+        "email": profile.email,
+        "phone": profile.phone,
+        "year": profile.year,
+        "gpa": profile.gpa,
+        "summary": profile.summary,
+        "skills": cached_skills(layout, profile.skills),
+        "activities": activities_html,
+        "generated_on": generated_on(),
+    }
+
+# Paginated render: with a page_size, only the first page_size cards go into
+# the page, followed by a loader that fetches the rest from
+# /portfolio_fragments in pages of the same size, so the page stays the
+# same size however many activities a student has logged. The loader fetches
+# a page when scrolled into view or clicked; each response names the next
+# page in its X-Next-Page header. Fragment URLs are relative, so paginated
+# pages only work when served by this API; downloads should render in full.
+ACTIVITY_LOADER = Template("""
+            <div class="activity-loader" data-next="{{url}}" style="text-align: center; margin: 20px 0;">
+                <button type="button" style="padding: 8px 20px; border: 1px solid #ccc; border-radius: 20px; background: white; cursor: pointer;">Show more activities</button>
+            </div>
+            <script>
+                (function () {
+                    var loader = document.currentScript.previousElementSibling;
+                    var button = loader.querySelector("button");
+                    function load() {
+                        if (button.disabled) return;
+                        button.disabled = true;
+                        fetch(loader.dataset.next).then(function (response) {
+                            if (!response.ok) throw new Error(response.status);
+                            return response.text().then(function (html) {
+                                loader.insertAdjacentHTML("beforebegin", html);
+                                var next = response.headers.get("X-Next-Page");
+                                if (next) {
+                                    loader.dataset.next = next;
+                                    button.disabled = false;
+                                } else {
+                                    loader.remove();
+                                }
+                            });
+                        }).catch(function () {
+                            button.textContent = "Couldn't load more activities, try again";
+                            button.disabled = false;
+                        });
+                    }
+                    button.addEventListener("click", load);
+                    if ("IntersectionObserver" in window) {
+                        new IntersectionObserver(function (entries) {
+                            if (entries[0].isIntersecting) load();
+                        }).observe(loader);
+                    }
+                })();
+            </script>
+            """, params=("url",), minify=MINIFY_HTML)
+
+def fragments_url(token, cursor, limit):
+    return f"/portfolio_fragments/{token}?cursor={cursor}&limit={limit}"
+
+def generate_html_portfolio(profile: StudentProfile, activities: List[Activity], layout="standard", inline_css=True,
+                            page_size=0, token=None):
+    # token identifies the activities in portfolio_pages when paginating
+    layout = resolve_layout(layout)
+    card = LAYOUT_TEMPLATES[layout][1]
+    cards = activities[:page_size] if page_size else activities
+    activities_html = "".join([cached_activity(layout, card, activity) for activity in cards])
+    if len(cards) < len(activities):
+        activities_html += ACTIVITY_LOADER.render(fragments_url(token, page_size, page_size))
+    return page_template(layout, inline_css).render(portfolio_values(profile, activities_html, layout))
+
+# Streaming render: the page is rendered once with a marker in place of the
+# activity cards and split around it, so the head and CSS go out first and
+# the cards follow in chunks. Memory stays flat however many activities a
+# student has logged.
+_STREAM_MARKER = f"\0{uuid.uuid4().hex}\0"
+STREAM_CHUNK_SIZE = 16 * 1024
+
+def iter_html_portfolio(profile: StudentProfile, activities: List[Activity], layout="standard", inline_css=True):
+    layout = resolve_layout(layout)
+    card = LAYOUT_TEMPLATES[layout][1]
+    html = page_template(layout, inline_css).render(portfolio_values(profile, _STREAM_MARKER if activities else "", layout))
+    head, _, tail = html.partition(_STREAM_MARKER)
+    yield head
+    chunk = []
+    size = 0
+    for activity in activities:
+        card_html = cached_activity(layout, card, activity)
+        chunk.append(card_html)
+        size += len(card_html)
+        if size >= STREAM_CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk = []
+            size = 0
+    chunk.append(tail)
+    yield "".join(chunk)
+
+# Rendered portfolios, keyed by a hash of the profile, activities and layout.
+# Students reopening their profile page post the same payload again, so most
+# requests are served from here. The footer date is part of the key and the
+# cache is emptied when the day rolls over.
+PORTFOLIO_CACHE_MAX_BYTES = int(os.environ.get("PORTFOLIO_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+portfolio_cache = LRUCache(PORTFOLIO_CACHE_MAX_BYTES)
+_portfolio_cache_day = ""
+
+def portfolio_cache_key(req: PortfolioRequest, day, inline_css=True, page_size=0):
+    content = fastcodec.dump_json(req, {"profile", "activities"})
+    digest = hashlib.sha256(content.encode()).hexdigest()
+    style = "inline" if inline_css else "link"
+    return f"{day}:{resolve_layout(req.layout)}:{style}:{page_size}:{digest}"
+
+def portfolio_cache_day():
+    global _portfolio_cache_day
+    day = generated_on()
+    if day != _portfolio_cache_day:
+        portfolio_cache.clear()
+        _portfolio_cache_day = day
+    return day
+
+def current_portfolio_cache_key(req: PortfolioRequest, inline_css=True, page_size=0):
+    return portfolio_cache_key(req, portfolio_cache_day(), inline_css, page_size)
+
+def portfolio_token(key):
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+def render_portfolio(req: PortfolioRequest, key=None, inline_css=True, page_size=0):
+    key = key or current_portfolio_cache_key(req, inline_css, page_size)
+    body = portfolio_cache.get(key)
+    if body is None:
+        layout = resolve_layout(req.layout)
+        start = time.perf_counter()
+        body = generate_html_portfolio(
+            req.profile,
+            req.activities or [],
+            layout,
+            inline_css,
+            page_size,
+            portfolio_token(key),
+        ).encode()
+        metrics.RENDER_SECONDS.observe(time.perf_counter() - start, layout, "html")
+        portfolio_cache.set(key, body)
+    return body
+
+# Portfolios are sent compressed when the client accepts it; compressed
+# variants are cached next to the rendered page under key + ":" + encoding.
+# The ETag hashes the cache key, so it changes with the profile, activities,
+# layout and footer date, and it names the encoding because a strong
+# validator has to differ between representations.
+LAYOUT_GZIP = {
+    (layout, inline_css): PrefixGzip(page_template(layout, inline_css).static_prefix.encode())
+    for layout in LAYOUT_TEMPLATES
+    for inline_css in (True, False)
+}
+
+def encoded_etag(digest, encoding):
+    return f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"'
+
+def portfolio_etag(key, encoding):
+    return encoded_etag(portfolio_token(key), encoding)
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+# Rendering and scoring run on a small thread pool rather than the event
+# loop, so one large portfolio doesn't hold up every other request on the
+# worker. At most CPU_CONCURRENCY calls run and CPU_QUEUE_SIZE wait; past
+# that requests get a 503 with Retry-After. Cache hits skip the pool. A
+# streamed render holds one slot for as long as it streams and produces
+# its chunks on the pool.
+CPU_CONCURRENCY = int(os.environ.get("CPU_CONCURRENCY", 2))
+CPU_QUEUE_SIZE = int(os.environ.get("CPU_QUEUE_SIZE", 32))
+cpu_executor = BoundedExecutor(CPU_CONCURRENCY, CPU_QUEUE_SIZE)
+
+def server_busy(e: Overloaded):
+    return HTTPException(
+        status_code=503,
+        detail="Server busy, please retry",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+async def run_bounded(executor, fn, *args):
     try:
-        html_content = generate_html_portfolio(
-            req.profile, 
-            req.activities or [], 
-            req.layout or "standard"
-        )
-        return HTMLResponse(content=html_content, status_code=200)
+        return await executor.run(fn, *args)
+    except Overloaded as e:
+        raise server_busy(e)
+
+async def run_cpu(fn, *args):
+    # Profiled requests get the thread's share of the work in their profile
+    return await run_bounded(cpu_executor, profiling.profiled(fn), *args)
+
+async def stream_cpu(chunks, release):
+    # Produces the chunks of a streamed response on the CPU pool, one call
+    # per chunk, under a slot reserved for the whole stream; release gives
+    # the slot back
+    produce = profiling.profiled(next)
+    try:
+        while True:
+            chunk = await cpu_executor.run_reserved(produce, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        release()
+
+def encoded_portfolio(req: PortfolioRequest, key, encoding, inline_css=True, page_size=0):
+    body = render_portfolio(req, key, inline_css, page_size)
+    if encoding == "identity":
+        return body
+    encoded_key = f"{key}:{encoding}"
+    encoded = portfolio_cache.get(encoded_key)
+    if encoded is None:
+        encoded = compression.compress(body, encoding, LAYOUT_GZIP[resolve_layout(req.layout), inline_css])
+        portfolio_cache.set(encoded_key, encoded)
+    return encoded
+
+# Layout stylesheets for pages rendered with link_css. They are compressed
+# once at startup, and since the file name changes whenever the CSS does,
+# clients can cache them for good.
+STYLESHEETS = {layout: compression.precompress(css) for layout, css in LAYOUT_CSS.items()}
+STYLESHEET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+@app.get("/static/layout/{layout}.{digest}.css")
+async def layout_stylesheet(
+    layout: str,
+    digest: str,
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    if STYLESHEET_PATHS.get(layout) != f"/static/layout/{layout}.{digest}.css":
+        raise HTTPException(status_code=404, detail="Stylesheet not found")
+    encoding = compression.negotiate(accept_encoding)
+    headers = {
+        "Cache-Control": STYLESHEET_CACHE_CONTROL,
+        "ETag": encoded_etag(digest, encoding),
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(STYLESHEETS[layout][encoding], media_type="text/css; charset=utf-8", headers=headers)
+
+@app.post("/generate_portfolio", openapi_extra=fastcodec.body_schema(PortfolioRequest))
+async def generate_portfolio(
+    req: PortfolioRequest = Depends(fastcodec.body_decoder(PortfolioRequest)),
+    stream: bool = False,
+    link_css: bool = False,
+    page_size: int = 0,
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    metrics.set_layout(resolve_layout(req.layout))
+    observe_activities(req.profile, req.activities)
+    try:
+        inline_css = not link_css
+        page_size = max(page_size, 0)
+        key = current_portfolio_cache_key(req, inline_css, page_size)
+        return await portfolio_response(req, key, stream, inline_css, page_size, accept_encoding, if_none_match)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Resume generation failed: {str(e)}")
+
+async def portfolio_response(req: PortfolioRequest, key, stream, inline_css, page_size, accept_encoding, if_none_match):
+    # The HTML response for req, whose rendering is cached under key
+    paginated = page_size and len(req.activities or []) > page_size
+    if paginated:
+        # Also on cache hits, so a cached page's loader keeps working
+        await keep_portfolio_pages(portfolio_token(key), resolve_layout(req.layout), req.activities)
+    # Large portfolios are streamed straight through rather than
+    # materialized for the cache
+    streaming = stream and not paginated and key not in portfolio_cache
+    encoding = "identity" if streaming else compression.negotiate(accept_encoding)
+    headers = {"ETag": portfolio_etag(key, encoding), "Vary": "Accept-Encoding"}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    if streaming:
+        try:
+            release = cpu_executor.reserve()
+        except Overloaded as e:
+            raise server_busy(e)
+        chunks = iter_html_portfolio(req.profile, req.activities or [], resolve_layout(req.layout), inline_css)
+        return StreamingResponse(
+            stream_cpu(chunks, release),
+            media_type="text/html; charset=utf-8",
+            headers=headers,
+            # In case the stream never starts
+            background=BackgroundTask(release),
+        )
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    cache_key = key if encoding == "identity" else f"{key}:{encoding}"
+    html_content = portfolio_cache.get(cache_key) if cache_key in portfolio_cache else None
+    if html_content is None:
+        html_content = await run_cpu(encoded_portfolio, req, key, encoding, inline_css, page_size)
+    return HTMLResponse(content=html_content, status_code=200, headers=headers)
     
-DEFAULT_ACTIVITY_POOL = [
-    {"type": "workshop", "title": "Advanced ML Workshop", "tags": ["ml", "python", "projects"], "desc": "Hands-on ML workshop"},
-    {"type": "internship", "title": "Research Internship (CS Dept)", "tags": ["research", "paper", "nlp"], "desc": "Short research internship"},
-    {"type": "project", "title": "Open-source Contribution Sprint", "tags": ["github", "collab", "backend"], "desc": "Contribute to OSS"},
-    {"type": "cert", "title": "Cloud Certification (Foundations)", "tags": ["cloud", "aws", "gcp"], "desc": "Entry cloud cert"},
-    {"type": "competition", "title": "Hackathon: 48-hour", "tags": ["hackathon", "team", "product"], "desc": "Build prototype"},
-    {"type": "course", "title": "Advanced Security Course", "tags": ["security", "network", "crypto"], "desc": "Security fundamentals"},
-    {"type": "workshop", "title": "NLP Hands-on", "tags": ["nlp", "transformers"], "desc": "NLP fine-tuning"},
-    {"type": "volunteer", "title": "Teaching Assistant", "tags": ["teaching", "mentor"], "desc": "TA for undergrads"}
-]
+# Activities of paginated portfolios, by portfolio token, for
+# /portfolio_fragments. They are kept in the portfolio store for
+# PORTFOLIO_PAGES_TTL seconds, since the fragment requests can land on any
+# server process, including one started after the page was rendered.
+# portfolio_pages caches them in front of the store as (layout, activities,
+# saved); its entries only hold references to the request's activities, so
+# they are counted rather than sized. A page this process saved less than
+# the TTL ago is still in the store and isn't saved again.
+PORTFOLIO_PAGES_SIZE = int(os.environ.get("PORTFOLIO_PAGES_SIZE", 1000))
+PORTFOLIO_PAGES_TTL = float(os.environ.get("PORTFOLIO_PAGES_TTL", 3600))
+PORTFOLIO_PAGE_MAX = 100
+portfolio_pages = LRUCache(PORTFOLIO_PAGES_SIZE, sizeof=lambda entry: 1, ttl=PORTFOLIO_PAGES_TTL)
 
-def recommend_activities(profile: StudentProfile, past_activities: List[Activity], num_recs=6):
-    scores = []
+def save_portfolio_pages(token, layout, activities: List[Activity]):
+    data = [fastcodec.to_builtins(activity) for activity in activities]
+    get_portfolio_store().save_pages(token, layout, data, PORTFOLIO_PAGES_TTL)
+    portfolio_pages.set(token, (layout, activities, True))
+
+def load_portfolio_pages(token):
+    stored = get_portfolio_store().pages(token)
+    if stored is None or stored[0] not in LAYOUT_TEMPLATES:
+        return None
+    layout, data = stored
+    entry = (layout, [Activity.model_validate(activity) for activity in data], False)
+    portfolio_pages.set(token, entry)
+    return entry
+
+async def keep_portfolio_pages(token, layout, activities: List[Activity]):
+    entry = portfolio_pages.get(token)
+    if entry is None or not entry[2]:
+        await asyncio.to_thread(save_portfolio_pages, token, layout, activities)
+
+@app.get("/portfolio_fragments/{token}")
+async def portfolio_fragments(token: str, cursor: int = 0, limit: int = 20):
+    entry = portfolio_pages.get(token)
+    if entry is None:
+        entry = await asyncio.to_thread(load_portfolio_pages, token)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Portfolio expired, please generate it again")
+    if cursor < 0 or limit < 1:
+        raise HTTPException(status_code=400, detail="cursor must be >= 0 and limit >= 1")
+    limit = min(limit, PORTFOLIO_PAGE_MAX)
+    layout, activities, _ = entry
+    card = LAYOUT_TEMPLATES[layout][1]
+    html_content = "".join([cached_activity(layout, card, activity) for activity in activities[cursor:cursor + limit]])
+    headers = {"Cache-Control": "private, max-age=3600"}
+    if cursor + limit < len(activities):
+        headers["X-Next-Page"] = fragments_url(token, cursor + limit, limit)
+    return HTMLResponse(content=html_content, headers=headers)
+
+# Stored portfolios. POST /portfolio saves a normalized PortfolioRequest and
+# returns its id, after which GET /portfolio/{id} renders it without the
+# client sending (and the server parsing) the whole profile again. Single
+# activities are added, changed and removed in place; each change bumps the
+# portfolio's version, which is part of its render cache keys, so only that
+# portfolio's renders are invalidated. Parsed requests are cached by id and
+# checked against the stored version on every view, so a change made
+# through another server process is picked up too.
+PORTFOLIO_DB = os.environ.get("PORTFOLIO_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "portfolios.db"))
+STORED_PORTFOLIO_CACHE_SIZE = int(os.environ.get("STORED_PORTFOLIO_CACHE_SIZE", 1000))
+stored_portfolio_cache = LRUCache(STORED_PORTFOLIO_CACHE_SIZE, sizeof=lambda entry: 1)
+_portfolio_store = None
+
+def get_portfolio_store():
+    # Opened on first use, so each server process gets its own connection
+    global _portfolio_store
+    if _portfolio_store is None:
+        _portfolio_store = PortfolioStore(PORTFOLIO_DB)
+    return _portfolio_store
+
+def stored_portfolio_cache_key(portfolio_id, version, layout, inline_css=True, page_size=0):
+    style = "inline" if inline_css else "link"
+    return f"{portfolio_cache_day()}:{layout}:{style}:{page_size}:stored:{portfolio_id}:{version}"
+
+def load_stored_portfolio(portfolio_id):
+    stored = get_portfolio_store().get(portfolio_id)
+    if stored is None:
+        return None
+    version, data = stored
+    entry = (version, PortfolioRequest.model_validate(data))
+    stored_portfolio_cache.set(portfolio_id, entry)
+    return entry
+
+def invalidate_stored_portfolio(portfolio_id):
+    stored_portfolio_cache.pop(portfolio_id)
+    marker = f":stored:{portfolio_id}:"
+    portfolio_cache.discard_keys(lambda key: marker in key)
+
+def assign_activity_ids(activities):
+    for activity in activities:
+        if not activity.get("id"):
+            activity["id"] = uuid.uuid4().hex[:12]
+    ids = [activity["id"] for activity in activities]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Activity ids must be unique")
+    return ids
+
+def find_activity(data, activity_id):
+    for index, activity in enumerate(data["activities"]):
+        if activity["id"] == activity_id:
+            return index
+    raise HTTPException(status_code=404, detail="Activity not found")
+
+def validated_activity(activity):
+    try:
+        return Activity.model_validate(activity).model_dump(mode="json")
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+
+def store_portfolio(req: PortfolioRequest):
+    data = req.model_dump(mode="json")
+    data["activities"] = data["activities"] or []
+    ids = assign_activity_ids(data["activities"])
+    return get_portfolio_store().create(data), ids
+
+def update_stored_portfolio(portfolio_id, change, activity_id=None):
+    # activity_id names an added or changed activity for the co-occurrence model
+    updated = get_portfolio_store().update(portfolio_id, change)
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    invalidate_stored_portfolio(portfolio_id)
+    version, data = updated
+    if activity_id is not None:
+        activity = data["activities"][find_activity(data, activity_id)]
+        observe_activities(StudentProfile.model_validate(data["profile"]), [Activity.model_validate(activity)])
+    return {"id": portfolio_id, "version": version}
+
+@app.post("/portfolio", status_code=201)
+async def create_stored_portfolio(req: PortfolioRequest):
+    observe_activities(req.profile, req.activities)
+    portfolio_id, activity_ids = await run_cpu(store_portfolio, req)
+    return {"id": portfolio_id, "version": 1, "activity_ids": activity_ids}
+
+@app.get("/portfolio/{portfolio_id}")
+async def get_stored_portfolio(
+    portfolio_id: str,
+    layout: Optional[str] = None,
+    stream: bool = False,
+    link_css: bool = False,
+    page_size: int = 0,
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    # Off the loop: the lookup can wait on the store's lock, and on SQLite's
+    # busy timeout while another process holds the write lock
+    version = await asyncio.to_thread(get_portfolio_store().version, portfolio_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    entry = stored_portfolio_cache.get(portfolio_id)
+    if entry is None or entry[0] != version:
+        entry = await run_cpu(load_stored_portfolio, portfolio_id)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Portfolio not found")
+    version, req = entry
+    if layout is not None:
+        req = req.model_copy(update={"layout": layout})
+    layout = resolve_layout(req.layout)
+    metrics.set_layout(layout)
+    try:
+        inline_css = not link_css
+        page_size = max(page_size, 0)
+        key = stored_portfolio_cache_key(portfolio_id, version, layout, inline_css, page_size)
+        return await portfolio_response(req, key, stream, inline_css, page_size, accept_encoding, if_none_match)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Resume generation failed: {str(e)}")
+
+@app.post("/portfolio/{portfolio_id}/activities", status_code=201)
+async def add_stored_activity(portfolio_id: str, activity: Activity):
+    activity = activity.model_dump(mode="json")
+    assign_activity_ids([activity])
+
+    def add(data):
+        assign_activity_ids(data["activities"] + [activity])
+        data["activities"].append(activity)
+        return data
+
+    result = await run_cpu(update_stored_portfolio, portfolio_id, add, activity["id"])
+    return {**result, "activity_id": activity["id"]}
+
+@app.patch("/portfolio/{portfolio_id}/activities/{activity_id}")
+async def update_stored_activity(portfolio_id: str, activity_id: str, changes: Dict[str, Any] = Body(...)):
+    if changes.get("id", activity_id) != activity_id:
+        raise HTTPException(status_code=400, detail="An activity's id can't be changed")
+
+    def patch(data):
+        index = find_activity(data, activity_id)
+        data["activities"][index] = validated_activity({**data["activities"][index], **changes})
+        return data
+
+    return await run_cpu(update_stored_portfolio, portfolio_id, patch, activity_id)
+
+@app.delete("/portfolio/{portfolio_id}/activities/{activity_id}")
+async def delete_stored_activity(portfolio_id: str, activity_id: str):
+    def delete(data):
+        del data["activities"][find_activity(data, activity_id)]
+        return data
+
+    return await run_cpu(update_stored_portfolio, portfolio_id, delete)
+
+@app.post("/generate_portfolio.pdf")
+async def generate_portfolio_pdf(req: PortfolioRequest):
+    metrics.set_layout(resolve_layout(req.layout))
+    observe_activities(req.profile, req.activities)
+    try:
+        key = current_portfolio_cache_key(req) + ":pdf"
+        pdf = portfolio_cache.get(key)
+        if pdf is None:
+            layout = resolve_layout(req.layout)
+            start = time.perf_counter()
+            pdf = await run_bounded(
+                pdf_executor,
+                pdf_resume.generate_pdf_portfolio,
+                req.profile,
+                req.activities or [],
+                layout,
+            )
+            # Includes any wait for a free worker
+            metrics.RENDER_SECONDS.observe(time.perf_counter() - start, layout, "pdf")
+            portfolio_cache.set(key, pdf)
+        filename = re.sub(r"[^A-Za-z0-9]+", "_", req.profile.name).strip("_") or "resume"
+        return Response(
+            content=pdf,
+            media_type="application/pdf",
+            headers={"Content-Disposition": f'inline; filename="{filename}.pdf"'},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Resume generation failed: {str(e)}")
+
+# Batch rendering for whole departments. Items are validated and rendered
+# independently in worker processes (rendering is pure Python, so threads
+# would serialize on the GIL), and results are streamed back as they finish.
+# At most BATCH_CONCURRENCY batches run at once, each with at most
+# RENDER_WORKERS items in the pool, so the pool's queue stays bounded; more
+# batches get a 503 with Retry-After.
+#
+# The pools start their workers from a fork server rather than by forking
+# this process: by the time a pool is first used the process runs threads
+# (the event loop's executors, the CPU pool), and a fork copies any lock
+# one of them holds. The fork server imports this module once and forks
+# the workers from there. Under serve.py RENDER_WORKERS and PDF_WORKERS
+# default to the cores divided among the server's workers.
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", os.cpu_count() or 1))
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", 2))
+_render_pool = None
+batch_gate = AdmissionGate(BATCH_CONCURRENCY)
+
+def pool_context():
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__])
+    return context
+
+def get_render_pool():
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS, mp_context=pool_context())
+    return _render_pool
+
+# PDF rendering is heavier still, so it gets its own small pool; workers
+# build the reportlab styles and warm the fonts once when they start. Like
+# the thread pool, it admits PDF_WORKERS running and PDF_QUEUE_SIZE waiting
+# renders and answers 503 beyond that.
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", min(2, os.cpu_count() or 1)))
+PDF_QUEUE_SIZE = int(os.environ.get("PDF_QUEUE_SIZE", 8))
+_pdf_pool = None
+
+def get_pdf_pool():
+    global _pdf_pool
+    if _pdf_pool is None:
+        _pdf_pool = ProcessPoolExecutor(
+            max_workers=PDF_WORKERS, mp_context=pool_context(), initializer=pdf_resume.preload
+        )
+    return _pdf_pool
+
+pdf_executor = BoundedExecutor(PDF_WORKERS, PDF_QUEUE_SIZE, name="pdf", pool=get_pdf_pool)
+
+def shutdown_render_pool():
+    # By now the server has drained its requests; renders still queued
+    # belong to abandoned requests and are dropped
+    for pool in (_render_pool, _pdf_pool):
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+    cpu_executor.shutdown()
+    cooccurrence_updates.shutdown()
+    if _portfolio_store is not None:
+        _portfolio_store.close()
+
+def render_batch_item(index, item):
+    # Runs in a worker process; errors are reported per item instead of
+    # failing the whole batch
+    try:
+        req = PortfolioRequest.model_validate(item)
+        html_content = render_portfolio(req)
+    except ValidationError as e:
+        return {"index": index, "status": "error", "error": e.errors(include_url=False, include_context=False)}
+    except Exception as e:
+        return {"index": index, "status": "error", "error": f"Resume generation failed: {str(e)}"}
+    return {
+        "index": index,
+        "status": "ok",
+        "name": req.profile.name,
+        "layout": resolve_layout(req.layout),
+        "html": html_content.decode(),
+    }
+
+async def render_batch(items):
+    loop = asyncio.get_running_loop()
+    pool = get_render_pool()
+    queued = enumerate(items)
+    pending = set()
+    try:
+        while True:
+            for index, item in itertools.islice(queued, RENDER_WORKERS - len(pending)):
+                pending.add(loop.run_in_executor(pool, render_batch_item, index, item))
+            if not pending:
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        # Client went away or the stream failed: drop whatever has not started yet
+        for future in pending:
+            future.cancel()
+
+async def released_after(stream, release):
+    try:
+        async for chunk in stream:
+            yield chunk
+    finally:
+        release()
+
+def batch_filename(result):
+    slug = re.sub(r"[^a-z0-9]+", "-", result["name"].lower()).strip("-") or "student"
+    return f"{result['index']:05d}_{slug}_{result['layout']}.html"
+
+class _ZipStream:
+    # Write-only file object for zipfile; the archive is flushed out chunk by
+    # chunk instead of being assembled in memory
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+async def stream_batch_ndjson(items):
+    async for result in render_batch(items):
+        yield json.dumps(result) + "\n"
+
+async def stream_batch_zip(items):
+    stream = _ZipStream()
+    errors = []
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        async for result in render_batch(items):
+            if result["status"] == "ok":
+                archive.writestr(batch_filename(result), result["html"])
+            else:
+                errors.append(result)
+            yield stream.drain()
+        if errors:
+            archive.writestr("errors.json", json.dumps(sorted(errors, key=lambda e: e["index"]), indent=2))
+    yield stream.drain()
+
+@app.post("/generate_portfolio/batch")
+async def generate_portfolio_batch(items: List[Dict[str, Any]] = Body(...), format: str = "ndjson"):
+    if format not in ("ndjson", "zip"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'zip'")
+    try:
+        release = batch_gate.enter()
+    except Overloaded as e:
+        raise server_busy(e)
+    # The slot goes back when the stream ends, or after the response if the
+    # stream never started
+    background = BackgroundTask(release)
+    if format == "ndjson":
+        return StreamingResponse(
+            released_after(stream_batch_ndjson(items), release),
+            media_type="application/x-ndjson",
+            background=background,
+        )
+    return StreamingResponse(
+        released_after(stream_batch_zip(items), release),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="portfolios.zip"'},
+        background=background,
+    )
+
+class CatalogItem(BaseModel):
+    type: str
+    title: str
+    tags: List[str] = []
+    desc: str = ""
+
+class ActivityCatalog:
+    # Recommendation catalog with the per-item values recommend_activities
+    # needs worked out once: normalized tags, lowercased titles, tie-breaks,
+    # an inverted index from tag to items and the order items fall in when
+    # nothing but the year bonus and tie-break separates them.
+    def __init__(self, items, version="builtin"):
+        self.items = items
+        self.version = version
+        self.loaded_at = datetime.utcnow()
+        self.tags = [frozenset(t.lower() for t in item.get("tags", [])) for item in items]
+        self.titles = [item["title"].lower() for item in items]
+        self.tiebreaks = [(sum(ord(c) for c in item["title"]) % 5) / 10.0 for item in items]
+        self.year_bonus = [item["type"] in ["internship", "project"] for item in items]
+        self.title_index = {}
+        for index, title in enumerate(self.titles):
+            self.title_index.setdefault(title, []).append(index)
+        self.tag_index = {}
+        for index, tags in enumerate(self.tags):
+            for tag in tags:
+                self.tag_index.setdefault(tag, []).append(index)
+        self.base_order = {
+            senior: sorted(range(len(items)), key=lambda i: (-self.base_score(i, senior), i))
+            for senior in (False, True)
+        }
+
+    def base_score(self, index, senior):
+        return (2 if senior and self.year_bonus[index] else 0) + self.tiebreaks[index]
+
+    @cached_property
+    def tag_matrix(self):
+        return TagMatrix(self)
+
+    @cached_property
+    def semantic_index(self):
+        return SemanticIndex(self.items)
+
+class TagMatrix:
+    # Item-by-tag incidence of a catalog in CSR form for vectorized scoring:
+    # item i has the tag columns columns[offsets[i]:offsets[i + 1]]. Items
+    # without tags point at an extra column that never carries weight, so no
+    # row is empty when the rows are summed with np.add.reduceat.
+    def __init__(self, catalog):
+        self.vocabulary = {tag: column for column, tag in enumerate(sorted(catalog.tag_index))}
+        self.width = len(self.vocabulary) + 1
+        columns = []
+        offsets = []
+        for tags in catalog.tags:
+            offsets.append(len(columns))
+            columns.extend(sorted(self.vocabulary[tag] for tag in tags) or [self.width - 1])
+        self.columns = np.array(columns, dtype=np.intp)
+        self.offsets = np.array(offsets, dtype=np.intp)
+        self.tiebreaks = np.array(catalog.tiebreaks, dtype=np.float64)
+        self.year_bonus = np.array(catalog.year_bonus, dtype=np.float64) * 2
+
+# The catalog lives in a JSONL file (one CatalogItem per line) so colleges can
+# add activities without a redeploy. A reload builds a complete new catalog,
+# derived features and tag matrix included, off the event loop and then
+# swaps the module-level reference in one assignment. Requests already
+# running keep the catalog object they started with.
+ACTIVITY_CATALOG_PATH = os.environ.get(
+    "ACTIVITY_CATALOG_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "activity_catalog.jsonl"),
+)
+CATALOG_WATCH_INTERVAL = float(os.environ.get("CATALOG_WATCH_INTERVAL", 5))
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+def load_activity_catalog(path, current_version=None):
+    # The version is a hash of the file, worked out before anything is
+    # parsed: a reload of an unchanged file (a touch, a copy of the same
+    # content) returns None instead of rebuilding the catalog, its tag
+    # matrix and its semantic index only to throw them away
+    with open(path, "rb") as f:
+        content = f.read()
+    version = hashlib.sha256(content).hexdigest()[:12]
+    if version == current_version:
+        return None
+    items = []
+    for lineno, line in enumerate(content.decode("utf-8").splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            items.append(CatalogItem.model_validate_json(line).model_dump())
+        except ValidationError as e:
+            raise ValueError(f"{path}:{lineno}: invalid catalog item: {e}") from e
+    catalog = ActivityCatalog(items, version=version)
+    # Built now so the first request after a swap doesn't pay for them
+    catalog.tag_matrix
+    catalog.semantic_index
+    return catalog
+
+activity_catalog = load_activity_catalog(ACTIVITY_CATALOG_PATH)
+_catalog_mtime = os.path.getmtime(ACTIVITY_CATALOG_PATH)
+_catalog_reload_lock = asyncio.Lock()
+
+def swap_activity_catalog(catalog):
+    global activity_catalog
+    old, activity_catalog = activity_catalog, catalog
+    invalidate_recommendations(old, catalog)
+
+async def reload_activity_catalog():
+    global _catalog_mtime
+    async with _catalog_reload_lock:
+        mtime = os.path.getmtime(ACTIVITY_CATALOG_PATH)
+        catalog = await asyncio.get_running_loop().run_in_executor(
+            None, load_activity_catalog, ACTIVITY_CATALOG_PATH, activity_catalog.version
+        )
+        if catalog is not None:
+            swap_activity_catalog(catalog)
+        _catalog_mtime = mtime
+        return activity_catalog
+
+async def watch_activity_catalog():
+    global _catalog_mtime
+    while True:
+        await asyncio.sleep(CATALOG_WATCH_INTERVAL)
+        try:
+            mtime = os.path.getmtime(ACTIVITY_CATALOG_PATH)
+            if mtime != _catalog_mtime:
+                # Remembered even if the load fails, so a broken file is
+                # reported once rather than on every poll
+                _catalog_mtime = mtime
+                await reload_activity_catalog()
+        except (OSError, ValueError) as e:
+            # A half-written or broken file keeps the current catalog in service
+            logger.warning("Activity catalog reload failed: %s", e)
+
+_catalog_watcher = None
+
+def start_catalog_watcher():
+    global _catalog_watcher
+    if CATALOG_WATCH_INTERVAL > 0:
+        _catalog_watcher = asyncio.create_task(watch_activity_catalog())
+
+def stop_catalog_watcher():
+    if _catalog_watcher is not None:
+        _catalog_watcher.cancel()
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    # Fails closed: with no ADMIN_TOKEN configured the admin endpoints are
+    # off rather than open to anyone
+    if not ADMIN_TOKEN or x_admin_token is None or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+def catalog_info(catalog):
+    return {
+        "version": catalog.version,
+        "items": len(catalog.items),
+        "loaded_at": catalog.loaded_at.isoformat(),
+    }
+
+@app.get("/admin/catalog", dependencies=[Depends(require_admin)])
+async def get_catalog():
+    return catalog_info(activity_catalog)
+
+@app.post("/admin/catalog/reload", dependencies=[Depends(require_admin)])
+async def reload_catalog():
+    try:
+        catalog = await reload_activity_catalog()
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Catalog reload failed: {str(e)}")
+    return catalog_info(catalog)
+
+# Per-request profiling (see profiling.py) of the portfolio and
+# recommendation handlers: with PROFILING=1 an admin asks for it with an
+# "X-Profile: 1" header next to X-Admin-Token (ignored without ADMIN_TOKEN),
+# and PROFILE_SAMPLE_RATE profiles that share of all such requests. With
+# neither set the middleware isn't installed at all.
+PROFILING = os.environ.get("PROFILING") == "1"
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_BUFFER_SIZE = int(os.environ.get("PROFILE_BUFFER_SIZE", 50))
+
+profile_store = ProfileStore(PROFILE_BUFFER_SIZE)
+if PROFILING or PROFILE_SAMPLE_RATE:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        paths=["/generate_portfolio", "/recommendations"],
+        sample_rate=PROFILE_SAMPLE_RATE,
+        header=PROFILING,
+        admin_token=ADMIN_TOKEN or "",
+    )
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    return {"profiles": profile_store.summaries()}
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str):
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+# Approved activity histories feed the co-occurrence model as requests come
+# in; a catalog item's co-occurrence with what the student has already done
+# is added to its score with this weight (0 turns the blend off).
+COOCCURRENCE_WEIGHT = float(os.environ.get("COOCCURRENCE_WEIGHT", 2.0))
+
+# Each new activity is paired with at most the student's last
+# COOCCURRENCE_WINDOW activities, and histories are kept for the
+# COOCCURRENCE_MAX_STUDENTS most recently seen students (see
+# cooccurrence.py for what that approximates). Only titles in the activity
+# catalog are counted: they are all a recommendation can score, and free
+# text from requests would otherwise grow the model without bound, on
+# purpose or not. Titles of items a reload removes stay in the model, so it
+# grows at most by the titles each reload adds. Updates run on their own
+# thread, off the event loop and in arrival order; when more than
+# COOCCURRENCE_QUEUE_SIZE are waiting, new ones are dropped and counted as
+# rejected rather than slowing requests down.
+COOCCURRENCE_WINDOW = int(os.environ.get("COOCCURRENCE_WINDOW", 50))
+COOCCURRENCE_MAX_STUDENTS = int(os.environ.get("COOCCURRENCE_MAX_STUDENTS", 100_000))
+COOCCURRENCE_QUEUE_SIZE = int(os.environ.get("COOCCURRENCE_QUEUE_SIZE", 1000))
+
+cooccurrence_model = CooccurrenceModel(COOCCURRENCE_WINDOW, COOCCURRENCE_MAX_STUDENTS)
+cooccurrence_updates = BoundedExecutor(1, COOCCURRENCE_QUEUE_SIZE, name="cooccurrence")
+
+def student_key(profile: StudentProfile):
+    return (profile.email or profile.name).lower()
+
+def approved_titles(activities: List[Activity]):
+    return [a.title.lower() for a in (activities or []) if a.status == "approved"]
+
+def observe_activities(profile: StudentProfile, activities: List[Activity]):
+    title_index = activity_catalog.title_index
+    titles = [title for title in approved_titles(activities) if title in title_index]
+    if not titles:
+        return
+    try:
+        cooccurrence_updates.submit(cooccurrence_model.observe, student_key(profile), titles)
+    except Overloaded:
+        pass
+
+def related_activities(catalog, past_activities):
+    # {catalog index: co-occurrence score} for items related to the history
+    if not COOCCURRENCE_WEIGHT:
+        return {}
+    related = {}
+    for title, score in cooccurrence_model.related(approved_titles(past_activities)).items():
+        for index in catalog.title_index.get(title, ()):
+            related[index] = score
+    return related
+
+def recommendation_entry(catalog, index, matches_interests, matches_skills, senior, also_done=False):
+    r = catalog.items[index]
+    reason_parts = []
+    if matches_interests:
+        reason_parts.append("matches your interests")
+    if matches_skills:
+        reason_parts.append("uses your skills")
+    if also_done:
+        reason_parts.append("students like you also did this")
+    if senior and catalog.year_bonus[index]:
+        reason_parts.append("good for final-year portfolio")
+    reason = "; ".join(reason_parts) if reason_parts else "recommended"
+    return {
+        "type": r["type"],
+        "title": r["title"],
+        "tags": r["tags"],
+        "description": r["desc"],
+        "reason": reason
+    }
+
+def rank_activities(catalog, profile: StudentProfile, past_activities: List[Activity], num_recs=6):
+    # The num_recs best (-score, index, matches_interests, matches_skills,
+    # also_done) for the profile, best first
+    if num_recs <= 0:
+        return []
     interest_set = set([t.lower() for t in (profile.interests or [])])
     skill_set = set([s.lower() for s in (profile.skills or [])])
     done_titles = set([a.title.lower() for a in (past_activities or [])])
+    senior = bool(profile.year and profile.year >= 3)
+    related = related_activities(catalog, past_activities)
+
+    # Only items sharing a tag with the profile or co-occurring with its
+    # history need scoring beyond the base order
+    candidates = set(related)
+    for tag in interest_set | skill_set:
+        candidates.update(catalog.tag_index.get(tag, ()))
+    metrics.RECOMMEND_CANDIDATES.observe(len(candidates))
 
-    for item in DEFAULT_ACTIVITY_POOL:
-        if item["title"].lower() in done_titles:
+    scored = []
+    for index in candidates:
+        if catalog.titles[index] in done_titles:
             continue
-        tags = set([t.lower() for t in item.get("tags", [])])
-        score = 0
-        score += 3 * len(tags & interest_set)
-        score += 2 * len(tags & skill_set)
-        if profile.year and profile.year >= 3 and item["type"] in ["internship", "project"]:
-            score += 2
-        score += (sum(ord(c) for c in item["title"]) % 5) / 10.0
-        scores.append((score, item))
-
-    scores.sort(key=lambda x: x[0], reverse=True)
-    recs = [s[1] for s in scores[:num_recs]]
-
-    out = []
-    for r in recs:
-        reason_parts = []
-        if interest_set & set([t.lower() for t in r["tags"]]):
-            reason_parts.append("matches your interests")
-        if skill_set & set([t.lower() for t in r["tags"]]):
-            reason_parts.append("uses your skills")
-        if profile.year and profile.year >= 3 and r["type"] in ["internship", "project"]:
-            reason_parts.append("good for final-year portfolio")
-        reason = "; ".join(reason_parts) if reason_parts else "recommended"
-        out.append({
-            "type": r["type"],
-            "title": r["title"],
-            "tags": r["tags"],
-            "description": r["desc"],
-            "reason": reason
-        })
-    return out
-
-@app.post("/recommendations")
-async def recommendations(req: RecommendationRequest):
-    recs = recommend_activities(req.profile, req.activities or [], num_recs=req.num_recs or 6)
-    return JSONResponse({"recommendations": recs})
+        tags = catalog.tags[index]
+        interests = tags & interest_set
+        skills = tags & skill_set
+        score = 3 * len(interests) + 2 * len(skills) + catalog.base_score(index, senior)
+        if index in related:
+            score += COOCCURRENCE_WEIGHT * related[index]
+        scored.append((-score, index, bool(interests), bool(skills), index in related))
+
+    # Everything else scores on year bonus and tie-break alone, which is
+    # already sorted; the first num_recs of those are all that can make it
+    taken = 0
+    for index in catalog.base_order[senior]:
+        if taken == num_recs:
+            break
+        if index in candidates or catalog.titles[index] in done_titles:
+            continue
+        scored.append((-catalog.base_score(index, senior), index, False, False, False))
+        taken += 1
+
+    return heapq.nsmallest(num_recs, scored)
+
+def recommendation_entries(catalog, profile: StudentProfile, ranked):
+    senior = bool(profile.year and profile.year >= 3)
+    return [
+        recommendation_entry(catalog, index, matches_interests, matches_skills, senior, also_done)
+        for _, index, matches_interests, matches_skills, also_done in ranked
+    ]
+
+def recommend_activities(profile: StudentProfile, past_activities: List[Activity], num_recs=6):
+    catalog = activity_catalog
+    return recommendation_entries(catalog, profile, rank_activities(catalog, profile, past_activities, num_recs))
+
+# /recommendations results are memoized, since the frontend posts the same
+# profile over and over while a student fills in a form. Entries expire
+# after RECOMMEND_CACHE_TTL seconds, which also bounds how far behind the
+# co-occurrence blend they can fall. A catalog reload only drops the entries
+# it could affect: those whose profile tags overlap a changed item, that
+# recommend a changed item, whose history co-occurs with a changed item, or
+# whose weakest recommendation a changed item could now beat on year bonus
+# and tie-break alone.
+RECOMMEND_CACHE_SIZE = int(os.environ.get("RECOMMEND_CACHE_SIZE", 10_000))
+RECOMMEND_CACHE_TTL = float(os.environ.get("RECOMMEND_CACHE_TTL", 300))
+
+recommend_cache = LRUCache(RECOMMEND_CACHE_SIZE, sizeof=lambda entry: 1, ttl=RECOMMEND_CACHE_TTL)
+
+class CachedRecommendations:
+    def __init__(self, version, recommendations, tags, titles, approved, senior, weakest):
+        self.version = version
+        self.recommendations = recommendations
+        self.tags = tags
+        self.titles = titles
+        self.approved = approved
+        self.senior = senior
+        self.weakest = weakest
+
+def recommend_cache_key(profile: StudentProfile, past_activities: List[Activity], num_recs):
+    return (
+        frozenset(t.lower() for t in profile.interests or []),
+        frozenset(s.lower() for s in profile.skills or []),
+        bool(profile.year and profile.year >= 3),
+        frozenset(a.title.lower() for a in past_activities or []),
+        frozenset(approved_titles(past_activities)),
+        num_recs,
+    )
+
+def cached_recommendations(key):
+    entry = recommend_cache.get(key)
+    if entry is not None and entry.version == activity_catalog.version:
+        return entry.recommendations
+    return None
+
+def cache_recommend_activities(profile: StudentProfile, past_activities: List[Activity], num_recs, key):
+    # Computes and caches the recommendations for key
+    catalog = activity_catalog
+    ranked = rank_activities(catalog, profile, past_activities, num_recs)
+    recs = recommendation_entries(catalog, profile, ranked)
+    # Short of num_recs means every eligible item is already in, so any new
+    # item would get in too
+    weakest = -ranked[-1][0] if ranked and len(ranked) == num_recs else -math.inf
+    titles = frozenset(catalog.titles[index] for _, index, *_ in ranked)
+    recommend_cache.set(key, CachedRecommendations(catalog.version, recs, key[0] | key[1], titles, key[4], key[2], weakest))
+    return recs
+
+def cached_recommend_activities(profile: StudentProfile, past_activities: List[Activity], num_recs=6):
+    key = recommend_cache_key(profile, past_activities, num_recs)
+    recs = cached_recommendations(key)
+    if recs is None:
+        recs = cache_recommend_activities(profile, past_activities, num_recs, key)
+    return recs
+
+def invalidate_recommendations(old, new):
+    # Drops the cached results a switch from catalog old to new could change
+    # and carries the rest over to the new version
+    old_items = {}
+    for title, item in zip(old.titles, old.items):
+        old_items.setdefault(title, []).append(item)
+    new_items = {}
+    for title, item in zip(new.titles, new.items):
+        new_items.setdefault(title, []).append(item)
+    changed = {title for title in old_items.keys() | new_items.keys() if old_items.get(title) != new_items.get(title)}
+    if [t for t in old.titles if t not in changed] != [t for t in new.titles if t not in changed]:
+        # Unchanged items were reordered, which moves tie-breaks between them
+        return recommend_cache.discard_where(lambda entry: True)
+
+    changed_tags = set()
+    for title in changed:
+        for item in old_items.get(title, []) + new_items.get(title, []):
+            changed_tags.update(t.lower() for t in item.get("tags", []))
+    best_base = {
+        senior: max((new.base_score(i, senior) for t in changed for i in new.title_index.get(t, ())), default=-math.inf)
+        for senior in (False, True)
+    }
+    # Co-occurrence pairs are symmetric and never removed, so an entry's
+    # history gives a changed item a bonus exactly when the history is
+    # among the titles related to the changed ones
+    cooccurring = set(cooccurrence_model.related(changed)) if COOCCURRENCE_WEIGHT else set()
+
+    def stale(entry):
+        if (
+            entry.version != old.version
+            or entry.tags & changed_tags
+            or entry.titles & changed
+            or entry.approved & cooccurring
+            or best_base[entry.senior] >= entry.weakest
+        ):
+            return True
+        entry.version = new.version
+        return False
+
+    return recommend_cache.discard_where(stale)
+
+# Cohort recommendations score every student against every catalog item at
+# once: a weight matrix of the students' interests (3) and skills (2) is
+# gathered through the catalog's tag columns and summed per item, then the
+# tie-breaks, the year bonus and the done-title mask are applied to the whole
+# block. Students are processed in chunks to bound the size of that block.
+RECOMMEND_BATCH_ELEMENTS = 4_000_000
+
+def recommend_activities_batch(requests: List[RecommendationRequest]):
+    catalog = activity_catalog
+    matrix = catalog.tag_matrix
+    n_items = len(catalog.items)
+    results = []
+    chunk = max(1, RECOMMEND_BATCH_ELEMENTS // max(len(matrix.columns), 1))
+    for start in range(0, len(requests), chunk):
+        batch = requests[start:start + chunk]
+        profiles = []
+        weights = np.zeros((len(batch), matrix.width))
+        senior = np.zeros(len(batch))
+        for row, req in enumerate(batch):
+            interest_set = set([t.lower() for t in (req.profile.interests or [])])
+            skill_set = set([s.lower() for s in (req.profile.skills or [])])
+            for tag in interest_set:
+                if tag in matrix.vocabulary:
+                    weights[row, matrix.vocabulary[tag]] += 3
+            for tag in skill_set:
+                if tag in matrix.vocabulary:
+                    weights[row, matrix.vocabulary[tag]] += 2
+            senior[row] = bool(req.profile.year and req.profile.year >= 3)
+            profiles.append((interest_set, skill_set, bool(senior[row]), related_activities(catalog, req.activities)))
+
+        if n_items:
+            scores = np.add.reduceat(weights[:, matrix.columns], matrix.offsets, axis=1)
+            scores += np.outer(senior, matrix.year_bonus)
+            scores += matrix.tiebreaks
+        else:
+            scores = np.zeros((len(batch), 0))
+        for row, req in enumerate(batch):
+            related = profiles[row][3]
+            if related:
+                scores[row, list(related)] += COOCCURRENCE_WEIGHT * np.fromiter(related.values(), dtype=np.float64)
+            for activity in req.activities or []:
+                scores[row, catalog.title_index.get(activity.title.lower(), [])] = -np.inf
+
+        for row, req in enumerate(batch):
+            chosen = top_k(scores[row], req.num_recs or 6)
+            interest_set, skill_set, is_senior, related = profiles[row]
+            results.append([
+                recommendation_entry(
+                    catalog,
+                    index,
+                    bool(catalog.tags[index] & interest_set),
+                    bool(catalog.tags[index] & skill_set),
+                    is_senior,
+                    index in related,
+                )
+                for index in chosen
+            ])
+    return results
+
+def top_k(scores, k):
+    # Indices of the k best scores, ordered by score and then catalog position
+    # like the single-student path; -inf marks excluded items
+    n_items = len(scores)
+    k = min(k, n_items)
+    if k <= 0:
+        return []
+    threshold = np.partition(scores, n_items - k)[n_items - k]
+    chosen = np.flatnonzero((scores >= threshold) & (scores > -np.inf))
+    return chosen[np.lexsort((chosen, -scores[chosen]))][:k].tolist()
+
+# Semantic mode scores the catalog by TF-IDF cosine similarity to the
+# student's interests and skills instead of exact tag matches, so related
+# wording ("machine learning" / "ml") still counts. Interests and skills are
+# weighted into one query and scored in a single pass. The score has no year
+# bonus, so results don't claim to suit a final-year portfolio.
+# SEMANTIC_MAX_POSTINGS switches to approximate search, which trades
+# noticeable quality for speed; exact scoring is the default.
+SEMANTIC_MAX_POSTINGS = int(os.environ.get("SEMANTIC_MAX_POSTINGS", 0)) or None
+
+def recommend_activities_semantic(profile: StudentProfile, past_activities: List[Activity], num_recs=6):
+    catalog = activity_catalog
+    index = catalog.semantic_index
+    interests = index.query_vector(profile.interests or [])
+    skills = index.query_vector(profile.skills or [])
+    query = {term: 3 * weight for term, weight in interests.items()}
+    for term, weight in skills.items():
+        query[term] = query.get(term, 0) + 2 * weight
+    scores = index.scores(query, SEMANTIC_MAX_POSTINGS)
+    for activity in past_activities or []:
+        scores[catalog.title_index.get(activity.title.lower(), [])] = -np.inf
+    chosen = top_k(scores, num_recs)
+    matches_interests = index.matches(interests, chosen)
+    matches_skills = index.matches(skills, chosen)
+    return [
+        recommendation_entry(catalog, i, matches_interests[n], matches_skills[n], False)
+        for n, i in enumerate(chosen)
+    ]
+
+@app.post("/recommendations", openapi_extra=fastcodec.body_schema(RecommendationRequest))
+async def recommendations(req: RecommendationRequest = Depends(fastcodec.body_decoder(RecommendationRequest))):
+    observe_activities(req.profile, req.activities)
+    num_recs = req.num_recs or 6
+    if req.mode == "semantic":
+        recs = await run_cpu(recommend_activities_semantic, req.profile, req.activities or [], num_recs)
+    elif req.mode in (None, "tags"):
+        key = recommend_cache_key(req.profile, req.activities or [], num_recs)
+        recs = cached_recommendations(key)
+        if recs is None:
+            recs = await run_cpu(cache_recommend_activities, req.profile, req.activities or [], num_recs, key)
+    else:
+        raise HTTPException(status_code=400, detail="mode must be 'tags' or 'semantic'")
+    return json_response({"recommendations": recs})
+
+def recommend_batch(requests: List[RecommendationRequest]):
+    # Tag requests go through the vectorized batch, semantic ones are scored
+    # one by one; results keep the order of the requests
+    results = [None] * len(requests)
+    tag_rows = [i for i, req in enumerate(requests) if req.mode != "semantic"]
+    for i, recs in zip(tag_rows, recommend_activities_batch([requests[i] for i in tag_rows])):
+        results[i] = recs
+    for i, req in enumerate(requests):
+        if req.mode == "semantic":
+            results[i] = recommend_activities_semantic(req.profile, req.activities or [], num_recs=req.num_recs or 6)
+    return results
+
+@app.post("/recommendations/batch")
+async def recommendations_batch(requests: List[RecommendationRequest]):
+    for i, req in enumerate(requests):
+        if req.mode not in (None, "tags", "semantic"):
+            raise HTTPException(status_code=400, detail=f"requests[{i}]: mode must be 'tags' or 'semantic'")
+    for req in requests:
+        observe_activities(req.profile, req.activities)
+    results = await run_cpu(recommend_batch, requests)
+    return json_response({"results": [{"recommendations": recs} for recs in results]})
+
+def json_response(content):
+    start = time.perf_counter()
+    response = fastcodec.json_response(content)
+    metrics.add_serialization(time.perf_counter() - start)
+    return response
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    metrics.record_cache("portfolio", portfolio_cache.stats())
+    metrics.record_cache("recommend", recommend_cache.stats())
+    metrics.record_cache("fragment", fragment_cache.stats())
+    metrics.record_executor("cpu", cpu_executor.stats())
+    metrics.record_executor("cooccurrence", cooccurrence_updates.stats())
+    metrics.record_executor("pdf", pdf_executor.stats())
+    metrics.record_executor("batch", batch_gate.stats())
+    return Response(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/health")
 async def health():
-    return {"status": "ok", "time": datetime.utcnow().isoformat()}
+    return {
+        "status": "ok",
+        "time": datetime.utcnow().isoformat(),
+        "portfolio_cache": portfolio_cache.stats(),
+        "recommend_cache": recommend_cache.stats(),
+        "fragment_cache": fragment_cache.stats(),
+        "portfolio_pages": portfolio_pages.stats(),
+        "cpu_executor": cpu_executor.stats(),
+        "pdf_executor": pdf_executor.stats(),
+        "batch_gate": batch_gate.stats(),
+        "cooccurrence": dict(cooccurrence_model.stats(), updates=cooccurrence_updates.stats()),
+    }
 
+# Development server; production runs serve.py
 if __name__ == "__main__":
 
     uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,424 @@
+from contextlib import contextmanager
+from html.parser import HTMLParser
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+
+from fastapi.responses import JSONResponse
+
+import app
+import fastcodec
+
+# Microbenchmarks for the rendering and recommendation hot paths, called
+# directly rather than over HTTP, and for request decoding and response
+# encoding with the pydantic models and stdlib json against the fastcodec
+# path. Render cases start from an empty fragment cache; rerender cases
+# start from one holding every activity card but the last. Each case
+# reports ops/sec (best of --repeat timed rounds), the peak memory one call
+# allocates and the size of its output.
+#
+#   python benchmark.py                  run and compare against the baseline
+#   python benchmark.py --save           run and store the results as the baseline
+#   python benchmark.py --only render    run the cases whose name starts with "render"
+#
+# A case whose ops/sec falls more than --threshold below its baseline fails
+# the run with exit status 1. Baselines are machine specific: save one on the
+# machine that runs the comparison.
+#
+# The minify cases render each layout with the templates as written and as
+# minified. When they run, the two renderings of a few portfolios are also
+# compared as a browser would lay them out (same elements and attributes,
+# same text once whitespace is collapsed, same CSS rules and scripts), and
+# any difference fails the run.
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+ACTIVITY_COUNTS = [0, 10, 100, 1000, 5000]
+ACTIVITY_TAG_COUNTS = [0, 5]
+CATALOG_SIZES = [8, 1000, 50000]
+PROFILE_TAG_COUNTS = [1, 5, 20]
+DECODE_ACTIVITY_COUNTS = [0, 100, 1000]
+RENDER_PAGE_SIZE = 20
+
+TYPES = ["workshop", "internship", "project", "certification", "competition", "course", "volunteer"]
+VOCABULARY = [f"tag{i}" for i in range(500)]
+
+def make_profile(rng, n_tags):
+    return app.StudentProfile(
+        name="Benchmark Student",
+        email="student@example.com",
+        phone="9876543210",
+        college="Example College of Engineering",
+        department="cse",
+        year=3,
+        gpa=8.5,
+        skills=rng.sample(VOCABULARY, n_tags),
+        interests=rng.sample(VOCABULARY, n_tags),
+        summary="Computer science student interested in systems, security and machine learning.",
+        linkedin="https://linkedin.com/in/student",
+        github="https://github.com/student",
+    )
+
+def make_activities(rng, count, n_tags):
+    return [
+        app.Activity(
+            type=rng.choice(TYPES),
+            title=f"Activity {i} & <Co>",
+            date=f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            description="Hands-on sessions covering design, implementation and review of a small project.",
+            tags=rng.sample(VOCABULARY, n_tags),
+        )
+        for i in range(count)
+    ]
+
+def make_catalog(rng, size):
+    return app.ActivityCatalog(
+        [
+            {
+                "type": rng.choice(TYPES),
+                "title": f"Catalog item {i}",
+                "tags": rng.sample(VOCABULARY, rng.randint(1, 4)),
+                "desc": "Catalog description",
+            }
+            for i in range(size)
+        ],
+        version=f"benchmark-{size}",
+    )
+
+def cold_render(profile, activities, layout, page_size=0):
+    app.fragment_cache.clear()
+    return app.generate_html_portfolio(profile, activities, layout, page_size=page_size, token="benchmark")
+
+def incremental_render(profile, activities, layout):
+    app.fragment_cache.pop(app.activity_fragment_key(layout, activities[-1]))
+    return app.generate_html_portfolio(profile, activities, layout)
+
+def render_cases(rng):
+    for layout in app.LAYOUT_TEMPLATES:
+        for count in ACTIVITY_COUNTS:
+            for n_tags in ACTIVITY_TAG_COUNTS:
+                profile = make_profile(rng, 5)
+                activities = make_activities(rng, count, n_tags)
+                yield (
+                    f"render/{layout}/activities={count}/tags={n_tags}",
+                    lambda p=profile, a=activities, l=layout: cold_render(p, a, l),
+                    lambda html: len(html.encode("utf-8")),
+                    None,
+                )
+                if count > RENDER_PAGE_SIZE:
+                    yield (
+                        f"render/{layout}/activities={count}/tags={n_tags}/page={RENDER_PAGE_SIZE}",
+                        lambda p=profile, a=activities, l=layout: cold_render(p, a, l, RENDER_PAGE_SIZE),
+                        lambda html: len(html.encode("utf-8")),
+                        None,
+                    )
+                if count:
+                    # The last activity is new, everything else is cached
+                    yield (
+                        f"rerender/{layout}/activities={count}/tags={n_tags}",
+                        lambda p=profile, a=activities, l=layout: incremental_render(p, a, l),
+                        lambda html: len(html.encode("utf-8")),
+                        None,
+                    )
+
+_unminified = None
+
+@contextmanager
+def unminified_templates():
+    # Swaps the app's templates for copies built from the unminified sources
+    global _unminified
+    def raw(template, **static):
+        return app.Template(template.source, template.params, False, **{**template.static, **static})
+    if _unminified is None:
+        _unminified = (
+            {
+                layout: (raw(page, stylesheet=app.inline_stylesheet(layout, minify=False)), raw(card))
+                for layout, (page, card) in app.LAYOUT_TEMPLATES.items()
+            },
+            {layout: raw(skills) for layout, skills in app.SKILLS_TEMPLATES.items()},
+            raw(app.ACTIVITY_LOADER),
+        )
+    saved = (app.LAYOUT_TEMPLATES, app.SKILLS_TEMPLATES, app.ACTIVITY_LOADER)
+    app.LAYOUT_TEMPLATES, app.SKILLS_TEMPLATES, app.ACTIVITY_LOADER = _unminified
+    app.fragment_cache.clear()
+    try:
+        yield
+    finally:
+        app.LAYOUT_TEMPLATES, app.SKILLS_TEMPLATES, app.ACTIVITY_LOADER = saved
+        app.fragment_cache.clear()
+
+def unminified_render(profile, activities, layout, page_size=0):
+    with unminified_templates():
+        return app.generate_html_portfolio(profile, activities, layout, page_size=page_size, token="benchmark")
+
+def minify_cases(rng):
+    for layout in app.LAYOUT_TEMPLATES:
+        profile = make_profile(rng, 5)
+        activities = make_activities(rng, 100, 5)
+        yield (
+            f"minify/{layout}/unminified",
+            lambda p=profile, a=activities, l=layout: unminified_render(p, a, l),
+            lambda html: len(html.encode("utf-8")),
+            None,
+        )
+        yield (
+            f"minify/{layout}/minified",
+            lambda p=profile, a=activities, l=layout: cold_render(p, a, l),
+            lambda html: len(html.encode("utf-8")),
+            None,
+        )
+
+# Layout model for the comparison: whitespace collapses to one space, and
+# none is rendered next to the start or end of these elements
+BLOCK_ELEMENTS = {
+    "html", "head", "body", "title", "meta", "link", "style", "script", "div", "p",
+    "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol", "li", "br", "hr",
+}
+
+def css_rules(css):
+    # CSS as tokens with insignificant whitespace removed; strings are kept
+    tokens = []
+    for token in re.findall(r"'[^']*'|\"[^\"]*\"|[{};]|[^{};'\"]+", re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)):
+        if token[0] not in "'\"":
+            token = re.sub(r"\s*([,:>])\s*", r"\1", " ".join(token.split()))
+            if not token:
+                continue
+        if token == "}" and tokens and tokens[-1] == ";":
+            tokens.pop()
+        tokens.append(token)
+    return tokens
+
+class RenderedPage(HTMLParser):
+    # The elements, attributes and visible text of a page, in document order
+    def __init__(self, html):
+        super().__init__(convert_charrefs=True)
+        self.items = []
+        self._raw = None
+        self.feed(html)
+        self.close()
+        self._trim()
+
+    def handle_decl(self, decl):
+        self.items.append(("decl", " ".join(decl.split()).lower()))
+
+    def handle_starttag(self, tag, attrs):
+        self.items.append(("start", tag, tuple((name, " ".join((value or "").split())) for name, value in attrs)))
+        if tag in ("style", "script"):
+            self._raw = tag
+
+    def handle_endtag(self, tag):
+        self._raw = None
+        self.items.append(("end", tag))
+
+    def handle_data(self, data):
+        if self._raw == "style":
+            self.items.append(("css", tuple(css_rules(data))))
+        elif self._raw == "script":
+            self.items.append(("script", " ".join(data.split())))
+        elif self.items and self.items[-1][0] == "text":
+            self.items[-1] = ("text", self.items[-1][1] + data)
+        else:
+            self.items.append(("text", data))
+
+    def _trim(self):
+        def block(item):
+            return item[0] in ("decl", "start", "end") and (item[0] == "decl" or item[1] in BLOCK_ELEMENTS)
+        trimmed = []
+        for i, item in enumerate(self.items):
+            if item[0] == "text":
+                text = re.sub(r"\s+", " ", item[1])
+                if i == 0 or block(self.items[i - 1]):
+                    text = text.lstrip()
+                if i == len(self.items) - 1 or block(self.items[i + 1]):
+                    text = text.rstrip()
+                if not text:
+                    continue
+                item = ("text", text)
+            trimmed.append(item)
+        self.items = trimmed
+
+def first_difference(a, b):
+    for i, (x, y) in enumerate(zip(a, b)):
+        if x != y:
+            return f"item {i}: {x!r:.120} != {y!r:.120}"
+    return f"{len(a)} items != {len(b)} items" if len(a) != len(b) else None
+
+def check_minified(rng):
+    # Renders portfolios with and without minification and checks they lay
+    # out the same; returns the number of mismatches
+    portfolios = [
+        ("sample", make_profile(rng, 5), make_activities(rng, 30, 5), 0),
+        ("paginated", make_profile(rng, 5), make_activities(rng, 30, 5), 10),
+        ("escaping", app.StudentProfile(name="A <b>&", skills=["x<y"], summary="s & t"),
+         [app.Activity(type="w", title="<t>", tags=["a&b"])], 0),
+        ("empty", app.StudentProfile(name="Z", skills=[]), [], 0),
+    ]
+    mismatches = 0
+    for layout in app.LAYOUT_TEMPLATES:
+        raw_size = minified_size = 0
+        for name, profile, activities, page_size in portfolios:
+            raw = unminified_render(profile, activities, layout, page_size)
+            minified = cold_render(profile, activities, layout, page_size)
+            raw_size += len(raw.encode("utf-8"))
+            minified_size += len(minified.encode("utf-8"))
+            difference = first_difference(RenderedPage(raw).items, RenderedPage(minified).items)
+            if difference:
+                mismatches += 1
+                print(f"MISMATCH minify/{layout}/{name}: {difference}")
+        print(f"minify/{layout}: {raw_size:,} -> {minified_size:,} B ({minified_size / raw_size - 1:+.1%}) "
+              f"over {len(portfolios)} portfolios")
+    return mismatches
+
+def recommend_cases(rng):
+    for size in CATALOG_SIZES:
+        catalog = make_catalog(rng, size)
+        for n_tags in PROFILE_TAG_COUNTS:
+            profile = make_profile(rng, n_tags)
+            past = make_activities(rng, 3, 2)
+            yield (
+                f"recommend/catalog={size}/profile_tags={n_tags}",
+                lambda p=profile, a=past: app.recommend_activities(p, a, 6),
+                lambda recs: len(json.dumps(recs).encode("utf-8")),
+                catalog,
+            )
+
+def codec_cases(rng):
+    decode_fast = fastcodec.body_decoder(app.PortfolioRequest) if fastcodec.STRUCTS else None
+    for count in DECODE_ACTIVITY_COUNTS:
+        body = json.dumps({
+            "profile": make_profile(rng, 5).model_dump(mode="json"),
+            "activities": [a.model_dump(mode="json") for a in make_activities(rng, count, 5)],
+            "layout": "modern",
+        }).encode()
+        yield (
+            f"decode/pydantic/activities={count}",
+            lambda b=body: app.PortfolioRequest.model_validate(json.loads(b)),
+            lambda req, b=body: len(b),
+            None,
+        )
+        if decode_fast is not None:
+            decoder = fastcodec.msgspec.json.Decoder(fastcodec.STRUCTS["PortfolioRequest"])
+            yield (
+                f"decode/fast/activities={count}",
+                lambda b=body, d=decoder: d.decode(b),
+                lambda req, b=body: len(b),
+                None,
+            )
+    for size in CATALOG_SIZES[:2]:
+        app.activity_catalog = make_catalog(rng, size)
+        recs = {"recommendations": app.recommend_activities(make_profile(rng, 5), [], 50)}
+        yield (
+            f"encode/json/recommendations={len(recs['recommendations'])}",
+            lambda r=recs: JSONResponse(r).body,
+            len,
+            None,
+        )
+        yield (
+            f"encode/fast/recommendations={len(recs['recommendations'])}",
+            lambda r=recs: fastcodec.json_response(r).body,
+            len,
+            None,
+        )
+
+def measure(fn, repeat, min_time):
+    # Best ops/sec over repeat rounds of at least min_time seconds each
+    fn()
+    best = 0.0
+    for _ in range(repeat):
+        calls = 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < min_time:
+            fn()
+            calls += 1
+            elapsed = time.perf_counter() - start
+        best = max(best, calls / elapsed)
+    return best
+
+def allocated(fn):
+    # Peak bytes allocated by a single call
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run(only, repeat, min_time):
+    rng = random.Random(42)
+    results = {}
+    saved_catalog = app.activity_catalog
+    try:
+        for cases in (render_cases(rng), recommend_cases(rng), codec_cases(rng), minify_cases(rng)):
+            for name, fn, output_size, catalog in cases:
+                if only and not name.startswith(only):
+                    continue
+                if catalog is not None:
+                    app.activity_catalog = catalog
+                results[name] = {
+                    "ops_per_sec": round(measure(fn, repeat, min_time), 2),
+                    "alloc_bytes": allocated(fn),
+                    "output_bytes": output_size(fn()),
+                }
+                print(f"{name:<50} {results[name]['ops_per_sec']:>12,.1f} ops/s "
+                      f"{results[name]['alloc_bytes']:>12,} B alloc {results[name]['output_bytes']:>12,} B out")
+    finally:
+        app.activity_catalog = saved_catalog
+    return results
+
+def compare(results, baseline, threshold):
+    # Names of the cases that got slower than the threshold allows
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        change = result["ops_per_sec"] / before["ops_per_sec"] - 1
+        if change < -threshold:
+            regressions.append(name)
+            print(f"REGRESSION {name}: {before['ops_per_sec']:,.1f} -> {result['ops_per_sec']:,.1f} ops/s ({change:+.1%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark portfolio rendering and recommendations")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed ops/sec drop, as a fraction")
+    parser.add_argument("--only", default="", help="only run cases whose name starts with this")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timed round")
+    args = parser.parse_args()
+
+    results = run(args.only, args.repeat, args.min_time)
+    if any(name.startswith("minify/") for name in results) and check_minified(random.Random(42)):
+        print("Minified output renders differently")
+        return 1
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save to create one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} case(s) regressed by more than {args.threshold:.0%}")
+        return 1
+    print("No regressions")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
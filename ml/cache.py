@@ -0,0 +1,98 @@
+from collections import OrderedDict
+import threading
+import time
+
+class LRUCache:
+    # In-process LRU cache bounded by the total size of the stored values,
+    # with entries optionally expiring ttl seconds after they were set.
+    # Safe to share between request handlers and worker threads.
+    def __init__(self, max_bytes, sizeof=len, ttl=None):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                del self._entries[key]
+                self._bytes -= entry[1]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        size = self.sizeof(value)
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                # Larger than the whole cache; storing it would only flush everything else
+                return
+            self._entries[key] = (value, size, expires)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            self._bytes -= entry[1]
+            return entry[0]
+
+    def discard_where(self, predicate):
+        # Drops every entry whose value satisfies predicate; returns how many
+        with self._lock:
+            stale = [key for key, (value, _, _) in self._entries.items() if predicate(value)]
+            for key in stale:
+                self._bytes -= self._entries.pop(key)[1]
+            return len(stale)
+
+    def discard_keys(self, predicate):
+        # Drops every entry whose key satisfies predicate; returns how many
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                self._bytes -= self._entries.pop(key)[1]
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        # Membership test only; does not count as a lookup or refresh the entry
+        return key in self._entries
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
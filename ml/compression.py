@@ -0,0 +1,81 @@
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content-Encoding negotiation and compression for HTML responses. Every
+# portfolio of a layout starts with the same bytes (doctype, head and the
+# inlined layout CSS), so PrefixGzip deflates that prefix once and keeps the
+# compressor state; each response copies the state and only compresses what
+# follows. Brotli is used when the brotli package is installed and the
+# client accepts it.
+#
+# Only gzip reuses the prefix: the brotli binding has no way to copy a
+# compressor's state, so br, though preferred, compresses the whole page
+# every time. With the minified CSS the shared prefix is about 2.5KB,
+# roughly 0.07ms of a br encode that takes 0.1-0.7ms for a page of 0 to
+# 500 activities, and encoded pages are cached, so br stays preferred for
+# its 14-34% smaller output.
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+def supported_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+def negotiate(accept_encoding):
+    # Best encoding the client accepts, in our order of preference, or
+    # "identity"
+    if not accept_encoding:
+        return "identity"
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    for coding in supported_encodings():
+        if accepted.get(coding, wildcard) > 0:
+            return coding
+    return "identity"
+
+def gzip_compress(body):
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+class PrefixGzip:
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        self._head = self._compressor.compress(prefix)
+
+    def compress(self, body):
+        if not body.startswith(self.prefix):
+            return gzip_compress(body)
+        compressor = self._compressor.copy()
+        return self._head + compressor.compress(body[len(self.prefix):]) + compressor.flush()
+
+def precompress(body):
+    # Every encoding of a static body, keyed like negotiate()'s result; it's
+    # compressed once, so at the highest levels
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+    encoded = {"identity": body, "gzip": compressor.compress(body) + compressor.flush()}
+    if brotli is not None:
+        encoded["br"] = brotli.compress(body, quality=11)
+    return encoded
+
+def compress(body, encoding, gzip=None):
+    # gzip is an optional PrefixGzip for bodies that share its prefix
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body) if gzip is not None else gzip_compress(body)
+    return body
@@ -0,0 +1,97 @@
+from collections import OrderedDict, deque
+import math
+import threading
+
+# Item-item co-occurrence model behind "students like you also did"
+# recommendations. Activities are identified by lower-cased title and
+# interned to small ints; each item keeps a dict of only the items it has
+# co-occurred with and how many students did both. A newly approved activity
+# bumps its pairs with the student's earlier ones and the model is never
+# rebuilt.
+#
+# Two bounds keep updates cheap and memory flat, at the cost of exactness:
+#
+# - A new activity is only paired with the student's window most recent
+#   ones, so an update costs O(window) per activity instead of O(history)
+#   and a first submission of thousands of activities isn't quadratic.
+#   Activities further apart than window in a student's history are not
+#   counted as co-occurring; with the default of 50 that only affects
+#   students with very long histories.
+# - Histories are kept for the max_students most recently seen students.
+#   An evicted student who comes back starts a fresh history, so their
+#   activities are counted a second time. The item and pair counts
+#   themselves are never dropped.
+#
+# Items are never dropped either, so the model is only bounded if the
+# titles it is given come from a bounded vocabulary: the app only passes
+# titles of its activity catalog, which caps the items at the catalog's
+# titles and each item's pairs at the number of items.
+
+class CooccurrenceModel:
+    def __init__(self, window=50, max_students=100_000):
+        self.window = window
+        self.max_students = max_students
+        self._ids = {}
+        self._titles = []
+        self._students = []  # item -> number of students who did it
+        self._pairs = []  # item -> {other item: students who did both}
+        self._histories = OrderedDict()  # student key -> (set of items, recent items), oldest first
+        self._lock = threading.Lock()
+
+    def _intern(self, title):
+        item = self._ids.get(title)
+        if item is None:
+            item = self._ids[title] = len(self._titles)
+            self._titles.append(title)
+            self._students.append(0)
+            self._pairs.append({})
+        return item
+
+    def observe(self, student, titles):
+        # Records titles as done by student; returns how many were new
+        added = 0
+        with self._lock:
+            history = self._histories.get(student)
+            if history is None:
+                history = self._histories[student] = (set(), deque(maxlen=self.window))
+                if len(self._histories) > self.max_students:
+                    self._histories.popitem(last=False)
+            else:
+                self._histories.move_to_end(student)
+            done, recent = history
+            for title in titles:
+                item = self._intern(title)
+                if item in done:
+                    continue
+                pairs = self._pairs[item]
+                for other in recent:
+                    pairs[other] = pairs.get(other, 0) + 1
+                    other_pairs = self._pairs[other]
+                    other_pairs[item] = other_pairs.get(item, 0) + 1
+                done.add(item)
+                recent.append(item)
+                self._students[item] += 1
+                added += 1
+        return added
+
+    def related(self, titles):
+        # {title: score} for everything done alongside any of titles, scored
+        # by the cosine similarity of the two items' student sets, summed
+        scores = {}
+        with self._lock:
+            for title in set(titles):
+                item = self._ids.get(title)
+                if item is None:
+                    continue
+                students = self._students[item]
+                for other, both in self._pairs[item].items():
+                    scores[other] = scores.get(other, 0.0) + both / math.sqrt(students * self._students[other])
+            return {self._titles[other]: score for other, score in scores.items()}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "items": len(self._titles),
+                "pairs": sum(len(pairs) for pairs in self._pairs) // 2,
+                "students": len(self._histories),
+            }
@@ -0,0 +1,180 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+from pydantic import ValidationError
+
+import app
+
+# Static export of a cohort's portfolios, for serving from a plain file
+# server during placement drives. Reads a JSONL file of PortfolioRequest
+# records and writes one self-contained HTML file per student per layout:
+#
+#   out/standard/priya-sharma-1f3a9c2e.html
+#   out/modern/priya-sharma-1f3a9c2e.html
+#   out/manifest.json
+#
+#   python export.py students.jsonl out/
+#   python export.py students.jsonl out/ --layouts standard,modern --workers 4
+#
+# Records are rendered across all cores. The manifest stores, per student, a
+# hash of their raw JSONL line together with the templates and CSS of the
+# exported layouts, so a re-run only validates and renders the records that
+# changed and the nightly rebuild of an unchanged cohort is mostly reading
+# and hashing the input. A record's layout field is ignored; every student
+# gets every exported layout. Files from the previous export that are no
+# longer produced (students who left the input, layouts dropped from
+# --layouts) are removed. The "generated on" footer keeps the date a file
+# was rendered.
+
+MANIFEST_NAME = "manifest.json"
+CHUNK_SIZE = 32
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def render_version(layouts):
+    # Changes whenever anything the exported pages are rendered from does;
+    # the parsed templates include the inlined CSS and any minification
+    digest = hashlib.sha256()
+    for layout in layouts:
+        page, card = app.LAYOUT_TEMPLATES[layout]
+        for part in (layout, page.nodes, card.nodes, app.SKILLS_TEMPLATES[layout].nodes):
+            digest.update(repr(part).encode())
+    return digest.hexdigest()
+
+def student_stem(profile):
+    # File name for a student: readable, and unique per email (or name)
+    key = (profile.get("email") or profile.get("name") or "").strip().lower()
+    slug = re.sub(r"[^a-z0-9]+", "-", key.partition("@")[0]).strip("-")[:40] or "student"
+    return f"{slug}-{hashlib.sha256(key.encode()).hexdigest()[:8]}"
+
+def student_paths(out_dir, stem, layouts):
+    return [os.path.join(out_dir, layout, f"{stem}.html") for layout in layouts]
+
+def write_file(path, data):
+    temp = f"{path}.tmp"
+    with open(temp, "wb") as f:
+        f.write(data)
+    os.replace(temp, path)
+
+def render_records(out_dir, layouts, records):
+    # Runs in a worker: validates and renders (line number, stem, line)
+    # records; returns (line number, error) for the ones that failed
+    errors = []
+    for number, stem, line in records:
+        try:
+            req = app.PortfolioRequest.model_validate_json(line)
+        except ValidationError as e:
+            errors.append((number, f"invalid record: {e.error_count()} error(s), first: {e.errors()[0]['msg']}"))
+            continue
+        for layout, path in zip(layouts, student_paths(out_dir, stem, layouts)):
+            html = app.generate_html_portfolio(req.profile, req.activities or [], layout)
+            write_file(path, html.encode())
+    return errors
+
+def read_records(path, version):
+    # (line number, stem, line, hash) for every record, keeping the last
+    # record of a student that appears more than once
+    records = {}
+    errors = []
+    with open(path, "rb") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                profile = json.loads(line)["profile"]
+                stem = student_stem(profile)
+            except (ValueError, KeyError, TypeError, AttributeError):
+                errors.append((number, "not a JSON object with a profile"))
+                continue
+            if stem in records:
+                errors.append((records[stem][0], f"student also on line {number}, skipped"))
+            digest = hashlib.sha256(version.encode() + line).hexdigest()
+            records[stem] = (number, stem, line, digest)
+    return list(records.values()), errors
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"layouts": [], "students": {}}
+
+def export(input_path, out_dir, layouts, workers, force=False):
+    start = time.perf_counter()
+    version = render_version(layouts)
+    records, errors = read_records(input_path, version)
+    manifest = load_manifest(out_dir)
+    previous = manifest["students"] if not force else {}
+
+    stale = [
+        record for record in records
+        if previous.get(record[1]) != record[3]
+        or not all(os.path.exists(path) for path in student_paths(out_dir, record[1], layouts))
+    ]
+    for layout in layouts:
+        os.makedirs(os.path.join(out_dir, layout), exist_ok=True)
+    chunks = [
+        [(number, stem, line) for number, stem, line, _ in stale[i:i + CHUNK_SIZE]]
+        for i in range(0, len(stale), CHUNK_SIZE)
+    ]
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(render_records, [out_dir] * len(chunks), [layouts] * len(chunks), chunks))
+    else:
+        results = [render_records(out_dir, layouts, chunk) for chunk in chunks]
+    failed = {number for chunk_errors in results for number, _ in chunk_errors}
+    for chunk_errors in results:
+        errors.extend(chunk_errors)
+
+    students = {stem: digest for number, stem, _, digest in records if number not in failed}
+    # Files from the last export that this one didn't produce: students who
+    # left the input, and layouts no longer exported
+    exported = {path for record in records for path in student_paths(out_dir, record[1], layouts)}
+    removed = 0
+    for stem in manifest["students"]:
+        for path in student_paths(out_dir, stem, manifest["layouts"]):
+            if path not in exported and os.path.exists(path):
+                os.remove(path)
+                removed += 1
+    write_file(
+        os.path.join(out_dir, MANIFEST_NAME),
+        json.dumps({"layouts": layouts, "version": version, "students": students}, indent=1, sort_keys=True).encode(),
+    )
+
+    for number, message in sorted(errors):
+        print(f"{input_path}:{number}: {message}", file=sys.stderr)
+    rendered = len(stale) - len(failed)
+    print(
+        f"{len(records)} students: {rendered} rendered, {len(records) - len(stale)} unchanged, "
+        f"{removed} files removed, {len(errors)} errors in {time.perf_counter() - start:.2f}s"
+    )
+    return not errors
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a cohort's portfolios as static HTML files")
+    parser.add_argument("input", help="JSONL file of portfolio requests, one student per line")
+    parser.add_argument("out", help="output directory")
+    parser.add_argument("--layouts", default=",".join(app.LAYOUT_TEMPLATES), help="comma separated layouts to export")
+    parser.add_argument("--workers", type=int, default=available_cores())
+    parser.add_argument("--force", action="store_true", help="render every record, changed or not")
+    args = parser.parse_args()
+
+    layouts = [layout.strip() for layout in args.layouts.split(",") if layout.strip()]
+    unknown = [layout for layout in layouts if layout not in app.LAYOUT_TEMPLATES]
+    if unknown or not layouts:
+        parser.error(f"unknown layouts {unknown}; choose from {', '.join(app.LAYOUT_TEMPLATES)}")
+    return 0 if export(args.input, args.out, layouts, args.workers, args.force) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
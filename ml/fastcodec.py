@@ -0,0 +1,187 @@
+from email.message import Message
+from typing import List, Optional, get_args
+import json
+import os
+
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, ValidationError
+from pydantic.networks import validate_email
+from pydantic_core import PydanticCustomError
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Fast request decoding and response encoding. When msgspec is installed,
+# request bodies are decoded straight into the msgspec Structs below. These
+# mirror the pydantic models field for field, so the handlers can read them
+# the same way. Struct decoding is strict: anything msgspec rejects (bad
+# input, but also values pydantic would coerce, such as "3" for an int)
+# goes through the pydantic models instead, exactly as FastAPI would
+# validate it, so clients get the same values and the same 422 errors
+# either way. FAST_DECODE=0 turns the fast path off. Responses are encoded
+# with orjson when it is installed.
+
+FAST_DECODE = os.environ.get("FAST_DECODE", "1") == "1"
+
+if msgspec is not None:
+    class ActivityStruct(msgspec.Struct, kw_only=True):
+        id: Optional[str] = None
+        type: str
+        title: str
+        # Union[date, str] keeps JSON strings as they are, so a str is equivalent
+        date: Optional[str] = None
+        description: Optional[str] = None
+        tags: Optional[List[str]] = []
+        proof_url: Optional[str] = None
+        status: Optional[str] = "approved"
+
+    class StudentProfileStruct(msgspec.Struct, kw_only=True):
+        name: str
+        email: Optional[str] = None
+        phone: Optional[str] = None
+        college: Optional[str] = None
+        department: Optional[str] = None
+        year: Optional[int] = None
+        gpa: Optional[float] = None
+        skills: Optional[List[str]] = []
+        interests: Optional[List[str]] = []
+        summary: Optional[str] = None
+        linkedin: Optional[str] = None
+        github: Optional[str] = None
+        profile_image_url: Optional[str] = None
+
+        def __post_init__(self):
+            # Same check and normalization as EmailStr
+            if self.email is not None:
+                try:
+                    self.email = validate_email(self.email)[1]
+                except PydanticCustomError as e:
+                    raise ValueError(str(e))
+
+    class PortfolioRequestStruct(msgspec.Struct, kw_only=True):
+        profile: StudentProfileStruct
+        activities: Optional[List[ActivityStruct]] = []
+        include_badges: Optional[bool] = True
+        layout: Optional[str] = "standard"
+
+    class RecommendationRequestStruct(msgspec.Struct, kw_only=True):
+        profile: StudentProfileStruct
+        activities: Optional[List[ActivityStruct]] = []
+        num_recs: Optional[int] = 6
+        mode: Optional[str] = "tags"
+
+    STRUCTS = {
+        "Activity": ActivityStruct,
+        "StudentProfile": StudentProfileStruct,
+        "PortfolioRequest": PortfolioRequestStruct,
+        "RecommendationRequest": RecommendationRequestStruct,
+    }
+else:
+    STRUCTS = {}
+
+def _models_in(annotation):
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        yield annotation
+    for arg in get_args(annotation):
+        yield from _models_in(arg)
+
+def _check_mirror(model):
+    # Catches a field added to a model (or a model nested in it) but not to
+    # its struct
+    struct = STRUCTS[model.__name__]
+    if tuple(model.model_fields) != struct.__struct_fields__:
+        raise TypeError(f"{struct.__name__} fields {struct.__struct_fields__} don't match {model.__name__}")
+    for field in model.model_fields.values():
+        for nested in _models_in(field.annotation):
+            _check_mirror(nested)
+
+def _is_json(content_type):
+    # The content types FastAPI parses as JSON
+    if not content_type:
+        return True
+    message = Message()
+    message["content-type"] = content_type
+    if message.get_content_maintype() != "application":
+        return False
+    subtype = message.get_content_subtype()
+    return subtype == "json" or subtype.endswith("+json")
+
+def _validate(model, body, content_type):
+    # FastAPI's own parsing and validation of a single body parameter
+    data = None
+    if body:
+        if _is_json(content_type):
+            try:
+                data = json.loads(body)
+            except json.JSONDecodeError as e:
+                raise RequestValidationError(
+                    [{"type": "json_invalid", "loc": ("body", e.pos), "msg": "JSON decode error", "input": {}, "ctx": {"error": e.msg}}],
+                    body=e.doc,
+                ) from e
+        else:
+            data = body
+    if data is None:
+        raise RequestValidationError([{"type": "missing", "loc": ("body",), "msg": "Field required", "input": None}])
+    try:
+        return model.model_validate(data, from_attributes=True)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body",) + error["loc"]} for error in e.errors(include_url=False)],
+            body=data,
+        )
+
+def body_decoder(model):
+    # Dependency that reads the request body as model, through its struct
+    # when the fast path is on
+    struct = STRUCTS.get(model.__name__) if FAST_DECODE else None
+    decoder = None
+    if struct is not None:
+        _check_mirror(model)
+        decoder = msgspec.json.Decoder(struct)
+
+    async def decode(request: Request):
+        body = await request.body()
+        content_type = request.headers.get("content-type")
+        if decoder is not None and body and _is_json(content_type):
+            try:
+                return decoder.decode(body)
+            except msgspec.MsgspecError:
+                pass
+        return _validate(model, body, content_type)
+
+    return decode
+
+def body_schema(model):
+    # openapi_extra documenting a body read by body_decoder
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": {"$ref": f"#/components/schemas/{model.__name__}"}}},
+        }
+    }
+
+def dump_json(obj, include):
+    # JSON of the include fields of a model or its struct, identical either way
+    if isinstance(obj, BaseModel):
+        return obj.model_dump_json(include=include)
+    return msgspec.json.encode({name: getattr(obj, name) for name in obj.__struct_fields__ if name in include}).decode()
+
+def to_builtins(obj):
+    # Plain JSON-ready value of a model or its struct, identical either way
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    return msgspec.to_builtins(obj)
+
+def json_response(content):
+    if orjson is not None:
+        return Response(orjson.dumps(content), media_type="application/json")
+    return JSONResponse(content)
@@ -0,0 +1,249 @@
+from bisect import bisect_left
+from contextvars import ContextVar
+import asyncio
+import functools
+import threading
+import time
+
+from fastapi.routing import APIRoute
+
+# Prometheus-style metrics kept in process and rendered in the text
+# exposition format for /metrics. Label values are passed positionally in
+# labelnames order; recording is a dict lookup and a few additions under a
+# lock, so it stays cheap enough for the request path.
+#
+# MetricsMiddleware times every request and records its status and response
+# size. MetricsRoute splits the time spent in a route into validation
+# (reading and validating the body, running dependencies), the endpoint
+# itself and serialization of what it returned. Metrics are per process.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000, 10000)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(labelnames, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set(self, value, *labels):
+        # For totals that are counted elsewhere, such as cache statistics
+        with self._lock:
+            self._values[labels] = value
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in values]
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS, registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (last one is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def observe(self, value, *labels):
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bucket] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        lines = []
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status"))
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Time from receiving a request to sending the last byte.", ("route", "method"))
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled.")
+RESPONSE_BYTES = Histogram("http_response_size_bytes", "Response body size.", ("route",), buckets=SIZE_BUCKETS)
+VALIDATION_SECONDS = Histogram("http_request_validation_seconds", "Time reading and validating the request and running dependencies.", ("route",))
+SERIALIZATION_SECONDS = Histogram("http_response_serialization_seconds", "Time serializing endpoint results into the response body.", ("route",))
+PORTFOLIO_REQUEST_SECONDS = Histogram("portfolio_request_duration_seconds", "Portfolio request time by layout.", ("route", "layout"))
+RENDER_SECONDS = Histogram("portfolio_render_seconds", "Time rendering a portfolio that was not cached.", ("layout", "format"))
+RECOMMEND_CANDIDATES = Histogram("recommendation_candidates", "Catalog items scored per recommendation request beyond the base order.", buckets=COUNT_BUCKETS)
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups by result.", ("cache", "result"))
+CACHE_HIT_RATIO = Gauge("cache_hit_ratio", "Share of cache lookups that were hits.", ("cache",))
+CACHE_ENTRIES = Gauge("cache_entries", "Entries currently cached.", ("cache",))
+EXECUTOR_ADMITTED = Gauge("executor_admitted", "Calls running or waiting on a bounded executor.", ("executor",))
+EXECUTOR_REJECTED = Counter("executor_rejected_total", "Calls turned away because the executor queue was full.", ("executor",))
+
+def record_cache(name, stats):
+    # Copies an LRUCache's stats() into the cache metrics
+    CACHE_LOOKUPS.set(stats["hits"], name, "hit")
+    CACHE_LOOKUPS.set(stats["misses"], name, "miss")
+    CACHE_HIT_RATIO.set(stats["hit_ratio"], name)
+    CACHE_ENTRIES.set(stats["entries"], name)
+
+def record_executor(name, stats):
+    # Copies a BoundedExecutor's stats() into the executor metrics
+    EXECUTOR_ADMITTED.set(stats["admitted"], name)
+    EXECUTOR_REJECTED.set(stats["rejected"], name)
+
+class RequestTimings:
+    __slots__ = ("handler_start", "endpoint_start", "endpoint_end", "handler_end", "serialize", "layout")
+
+    def __init__(self):
+        self.handler_start = self.endpoint_start = self.endpoint_end = self.handler_end = None
+        self.serialize = 0.0
+        self.layout = None
+
+_current = ContextVar("request_timings", default=None)
+
+def set_layout(layout):
+    # Labels the current request for the per-layout histograms
+    timings = _current.get()
+    if timings is not None:
+        timings.layout = layout
+
+def add_serialization(seconds):
+    # For endpoints that build their response body themselves
+    timings = _current.get()
+    if timings is not None:
+        timings.serialize += seconds
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_FLIGHT.dec()
+            _current.reset(token)
+            route = scope.get("route")
+            # Unmatched paths share one label to keep the series bounded
+            path = route.path if route is not None else "unmatched"
+            REQUESTS.inc(path, scope["method"], status)
+            REQUEST_SECONDS.observe(elapsed, path, scope["method"])
+            RESPONSE_BYTES.observe(size, path)
+            if timings.layout is not None:
+                PORTFOLIO_REQUEST_SECONDS.observe(elapsed, path, timings.layout)
+            if timings.endpoint_end is not None and timings.handler_end is not None:
+                VALIDATION_SECONDS.observe(timings.endpoint_start - timings.handler_start, path)
+                SERIALIZATION_SECONDS.observe(timings.handler_end - timings.endpoint_end + timings.serialize, path)
+
+class MetricsRoute(APIRoute):
+    def get_route_handler(self):
+        call = self.dependant.call
+        if asyncio.iscoroutinefunction(call):
+            @functools.wraps(call)
+            async def endpoint(*args, **kwargs):
+                timings = _current.get()
+                if timings is not None:
+                    timings.endpoint_start = time.perf_counter()
+                try:
+                    return await call(*args, **kwargs)
+                finally:
+                    if timings is not None:
+                        timings.endpoint_end = time.perf_counter()
+        else:
+            @functools.wraps(call)
+            def endpoint(*args, **kwargs):
+                timings = _current.get()
+                if timings is not None:
+                    timings.endpoint_start = time.perf_counter()
+                try:
+                    return call(*args, **kwargs)
+                finally:
+                    if timings is not None:
+                        timings.endpoint_end = time.perf_counter()
+        self.dependant.call = endpoint
+        handler = super().get_route_handler()
+
+        async def route_handler(request):
+            timings = _current.get()
+            if timings is not None:
+                timings.handler_start = time.perf_counter()
+            response = await handler(request)
+            if timings is not None:
+                timings.handler_end = time.perf_counter()
+            return response
+
+        return route_handler
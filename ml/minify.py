@@ -0,0 +1,43 @@
+import re
+
+# Whitespace and comment stripping for the layout templates and CSS, done
+# once when the templates are built rather than on every response.
+#
+# HTML: runs of whitespace collapse to one space, which is how browsers
+# render them anyway, and whitespace next to a block-level tag (or between
+# two template section tags) is dropped, since a line box never starts or
+# ends with a space. The templates have no <pre> or <textarea>, where
+# whitespace would be significant, and their scripts end every statement
+# with a semicolon. Template tags contain no whitespace, so they come
+# through untouched.
+#
+# CSS: comments go, whitespace collapses and is dropped around punctuation
+# that doesn't need it. Quoted strings are kept as they are.
+
+BLOCK_TAGS = (
+    "!DOCTYPE|html|head|body|title|meta|link|style|script|div|p|h[1-6]|ul|ol|li"
+    "|section|header|footer|main|nav|table|thead|tbody|tr|td|th|br|hr"
+)
+
+_SPACE_RE = re.compile(r"\s+")
+_BLOCK_TAG_RE = re.compile(rf"\s*(</?(?:{BLOCK_TAGS})\b[^>]*>)\s*", re.IGNORECASE)
+_SECTIONS_RE = re.compile(r"(\{\{[#^/][\w.]+\}\})\s+(?=\{\{[#^/])")
+_CSS_STRING_RE = re.compile(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")""")
+_CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+_CSS_PUNCTUATION_RE = re.compile(r"\s*([{};,>])\s*")
+_CSS_COLON_RE = re.compile(r":\s+")
+
+def minify_html(source):
+    html = _SPACE_RE.sub(" ", source)
+    html = _BLOCK_TAG_RE.sub(r"\1", html)
+    html = _SECTIONS_RE.sub(r"\1", html)
+    return html.strip()
+
+def minify_css(css):
+    parts = _CSS_STRING_RE.split(_CSS_COMMENT_RE.sub("", css))
+    for i in range(0, len(parts), 2):
+        part = _SPACE_RE.sub(" ", parts[i])
+        part = _CSS_PUNCTUATION_RE.sub(r"\1", part)
+        part = _CSS_COLON_RE.sub(":", part)
+        parts[i] = part.replace(";}", "}")
+    return "".join(parts).strip()
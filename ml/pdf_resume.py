@@ -0,0 +1,189 @@
+from datetime import datetime
+from html import escape
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import mm
+from reportlab.platypus import (
+    BaseDocTemplate, Frame, FrameBreak, PageTemplate, Paragraph, SimpleDocTemplate,
+)
+
+# PDF versions of the standard, modern and creative layouts. Styles are built
+# once per process at import; preload() also renders a throwaway document so
+# font metrics and reportlab's internal caches are warm before the first
+# real request reaches a worker.
+
+def _styles(font, bold_font, text, accent, muted):
+    return {
+        "name": ParagraphStyle("name", fontName=bold_font, fontSize=22, leading=26, textColor=text),
+        "title": ParagraphStyle("title", fontName=font, fontSize=11, leading=14, textColor=muted, spaceAfter=6),
+        "contact": ParagraphStyle("contact", fontName=font, fontSize=9, leading=12, textColor=text),
+        "section": ParagraphStyle("section", fontName=bold_font, fontSize=13, leading=16, textColor=accent, spaceBefore=10, spaceAfter=4),
+        "body": ParagraphStyle("body", fontName=font, fontSize=10, leading=14, textColor=text),
+        "activity": ParagraphStyle("activity", fontName=bold_font, fontSize=11, leading=14, textColor=text, spaceBefore=6),
+        "meta": ParagraphStyle("meta", fontName=font, fontSize=9, leading=12, textColor=muted),
+        "tags": ParagraphStyle("tags", fontName=font, fontSize=9, leading=12, textColor=accent),
+        "footer": ParagraphStyle("footer", fontName=font, fontSize=8, leading=10, textColor=muted, alignment=TA_CENTER, spaceBefore=16),
+    }
+
+LAYOUT_STYLES = {
+    # STANDARD: Simple, traditional format
+    "standard": _styles("Times-Roman", "Times-Bold", colors.black, colors.black, colors.HexColor("#444444")),
+    # MODERN: Professional two-column layout
+    "modern": _styles("Helvetica", "Helvetica-Bold", colors.HexColor("#2c3e50"), colors.HexColor("#3498db"), colors.HexColor("#7f8c8d")),
+    # CREATIVE: Sidebar design with vibrant colors
+    "creative": _styles("Helvetica", "Helvetica-Bold", colors.HexColor("#2c3e50"), colors.HexColor("#f5576c"), colors.HexColor("#95a5a6")),
+}
+
+SIDEBAR_COLORS = {
+    "modern": (colors.HexColor("#2c3e50"), colors.white),
+    "creative": (colors.HexColor("#f5576c"), colors.white),
+}
+
+def _sidebar_styles(styles, text_color):
+    return {key: ParagraphStyle(f"sidebar-{key}", parent=style, textColor=text_color) for key, style in styles.items()}
+
+SIDEBAR_STYLES = {
+    layout: _sidebar_styles(LAYOUT_STYLES[layout], text_color)
+    for layout, (_, text_color) in SIDEBAR_COLORS.items()
+}
+
+def _text(value):
+    return escape(str(value))
+
+def _contact_lines(profile):
+    lines = []
+    if profile.email:
+        lines.append(_text(profile.email))
+    if profile.phone:
+        lines.append(_text(profile.phone))
+    if profile.college:
+        lines.append(_text(profile.college))
+    if profile.year:
+        lines.append(f"Year {_text(profile.year)}")
+    if profile.gpa:
+        lines.append(f"GPA: {_text(profile.gpa)}")
+    return lines
+
+def _activity_flowables(activities, styles):
+    flowables = []
+    for activity in activities:
+        date_str = str(activity.date) if activity.date else "N/A"
+        flowables.append(Paragraph(_text(activity.title), styles["activity"]))
+        flowables.append(Paragraph(f"{_text(activity.type.upper())} &bull; {_text(date_str)}", styles["meta"]))
+        if activity.description:
+            flowables.append(Paragraph(_text(activity.description), styles["body"]))
+        if activity.tags:
+            flowables.append(Paragraph(", ".join(_text(tag) for tag in activity.tags), styles["tags"]))
+    return flowables
+
+def _footer(styles):
+    return Paragraph(f"Resume generated on {datetime.now().strftime('%B %d, %Y')}", styles["footer"])
+
+def _standard_story(profile, activities, styles):
+    title = _text(profile.department or "cse")
+    if profile.college:
+        title += f" at {_text(profile.college)}"
+    story = [
+        Paragraph(_text(profile.name.upper()), styles["name"]),
+        Paragraph(title, styles["title"]),
+        Paragraph(" | ".join(_contact_lines(profile)), styles["contact"]),
+    ]
+    if profile.summary:
+        story += [Paragraph("ABOUT", styles["section"]), Paragraph(_text(profile.summary), styles["body"])]
+    if profile.skills:
+        story += [Paragraph("SKILLS", styles["section"]), Paragraph(", ".join(_text(s) for s in profile.skills), styles["body"])]
+    if activities:
+        story += [Paragraph("ACTIVITIES", styles["section"])] + _activity_flowables(activities, styles)
+    story.append(_footer(styles))
+    return story
+
+SIDEBAR_WIDTH = 62 * mm
+MARGIN = 15 * mm
+
+def _sidebar_story(profile, activities, layout, styles):
+    # Modern and creative layouts: sidebar frame on the first page, then the
+    # main column, which can run over as many pages as the activities need
+    side = SIDEBAR_STYLES[layout]
+    title = _text(profile.department or "Computer Science")
+    if layout == "creative" and profile.college:
+        title += f" at {_text(profile.college)}"
+    story = [Paragraph(_text(profile.name), side["name"]), Paragraph(title, side["title"])]
+    story += [Paragraph("CONTACT", side["section"])] + [Paragraph(line, side["contact"]) for line in _contact_lines(profile)]
+    if profile.skills:
+        story += [Paragraph("SKILLS", side["section"])] + [Paragraph(_text(skill), side["contact"]) for skill in profile.skills]
+    story.append(FrameBreak())
+
+    if profile.summary:
+        heading = "Hello!" if layout == "creative" else "About Me"
+        story += [Paragraph(heading, styles["section"]), Paragraph(_text(profile.summary), styles["body"])]
+    if activities:
+        heading = "Experience & Activities" if layout == "creative" else "Activities & Experience"
+        story += [Paragraph(heading, styles["section"])] + _activity_flowables(activities, styles)
+    story.append(_footer(styles))
+    return story
+
+def _sidebar_page_templates(layout):
+    background, _ = SIDEBAR_COLORS[layout]
+    page_width, page_height = A4
+    main_width = page_width - SIDEBAR_WIDTH
+
+    def draw_sidebar(canvas, doc):
+        canvas.saveState()
+        canvas.setFillColor(background)
+        canvas.rect(0, 0, SIDEBAR_WIDTH, page_height, stroke=0, fill=1)
+        canvas.restoreState()
+
+    first = PageTemplate(
+        id="first",
+        frames=[
+            Frame(0, 0, SIDEBAR_WIDTH, page_height, leftPadding=8 * mm, rightPadding=6 * mm, topPadding=MARGIN, bottomPadding=MARGIN),
+            Frame(SIDEBAR_WIDTH, 0, main_width, page_height, leftPadding=10 * mm, rightPadding=MARGIN, topPadding=MARGIN, bottomPadding=MARGIN),
+        ],
+        onPage=draw_sidebar,
+        autoNextPageTemplate="later",
+    )
+    later = PageTemplate(
+        id="later",
+        frames=[Frame(SIDEBAR_WIDTH, 0, main_width, page_height, leftPadding=10 * mm, rightPadding=MARGIN, topPadding=MARGIN, bottomPadding=MARGIN)],
+        onPage=draw_sidebar,
+    )
+    return [first, later]
+
+def generate_pdf_portfolio(profile, activities, layout="standard"):
+    if layout not in LAYOUT_STYLES:
+        layout = "standard"
+    styles = LAYOUT_STYLES[layout]
+    buffer = BytesIO()
+    if layout == "standard":
+        doc = SimpleDocTemplate(
+            buffer,
+            pagesize=A4,
+            leftMargin=MARGIN,
+            rightMargin=MARGIN,
+            topMargin=MARGIN,
+            bottomMargin=MARGIN,
+            title=profile.name,
+        )
+        doc.build(_standard_story(profile, activities, styles))
+    else:
+        doc = BaseDocTemplate(buffer, pagesize=A4, title=profile.name, pageTemplates=_sidebar_page_templates(layout))
+        doc.build(_sidebar_story(profile, activities, layout, styles))
+    return buffer.getvalue()
+
+class _Sample:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+def preload():
+    # Process pool initializer: warm up fonts and layout code in each worker
+    profile = _Sample(
+        name="Preload", email=None, phone=None, college=None, department=None,
+        year=None, gpa=None, summary="-", skills=["-"],
+    )
+    activity = _Sample(type="-", title="-", date=None, description="-", tags=["-"])
+    for layout in LAYOUT_STYLES:
+        generate_pdf_portfolio(profile, [activity], layout)
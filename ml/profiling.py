@@ -0,0 +1,164 @@
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+import cProfile
+import hmac
+import io
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+
+# Opt-in per-request profiling. ProfilingMiddleware is only added to the app
+# when profiling is configured, so a disabled profiler costs nothing. For a
+# chosen request on one of the profiled paths it records a cProfile CPU
+# profile and a tracemalloc diff of what the request left allocated, and
+# keeps the result in a bounded ring buffer for the admin endpoints.
+#
+# tracemalloc is process-wide, so one request is profiled at a time and
+# anything else the process does meanwhile shows up in the allocations too;
+# profile on a quiet instance for clean numbers. cProfile only sees the
+# thread that enables it, so work the request hands to a thread pool has to
+# be wrapped with profiled(), which runs it under a profiler of its own
+# and merges that into the request's CPU report.
+
+PROFILE_TOP_FUNCTIONS = 40
+PROFILE_TOP_ALLOCATIONS = 25
+
+# The profilers of the current request's thread pool calls, while it is
+# being profiled
+_worker_profilers = ContextVar("worker_profilers", default=None)
+
+def profiled(fn):
+    # fn, run under its own profiler when the current request is profiled
+    profilers = _worker_profilers.get()
+    if profilers is None:
+        return fn
+
+    def run(*args):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return fn(*args)
+        finally:
+            profiler.disable()
+            profilers.append(profiler)
+
+    return run
+
+class ProfileStore:
+    def __init__(self, size):
+        self._profiles = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, profile):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def summaries(self):
+        with self._lock:
+            profiles = list(self._profiles)
+        return [
+            {key: profile[key] for key in ("id", "path", "trigger", "started_at", "duration_ms", "status")}
+            for profile in reversed(profiles)
+        ]
+
+    def get(self, profile_id):
+        with self._lock:
+            for profile in self._profiles:
+                if profile["id"] == profile_id:
+                    return profile
+        return None
+
+def _cpu_report(profiler, worker_profilers):
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    for worker_profiler in worker_profilers:
+        stats.add(worker_profiler)
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    return out.getvalue()
+
+def _allocation_diff(before, after):
+    return [
+        {
+            "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size_diff": stat.size_diff,
+            "count_diff": stat.count_diff,
+        }
+        for stat in after.compare_to(before, "lineno")[:PROFILE_TOP_ALLOCATIONS]
+    ]
+
+class ProfilingMiddleware:
+    def __init__(self, app, store, paths, sample_rate=0.0, header=False, admin_token=""):
+        self.app = app
+        self.store = store
+        self.paths = frozenset(paths)
+        self.sample_rate = sample_rate
+        self.header = header
+        self.admin_token = admin_token.encode()
+        self._busy = False
+
+    def _trigger(self, scope):
+        if self.header:
+            headers = dict(scope["headers"])
+            if headers.get(b"x-profile") in (b"1", b"true"):
+                # Only admins can ask. Like the admin endpoints this fails
+                # closed: with no admin token configured the header is ignored
+                token = headers.get(b"x-admin-token")
+                if self.admin_token and token is not None and hmac.compare_digest(token, self.admin_token):
+                    return "header"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths or self._busy:
+            return await self.app(scope, receive, send)
+        trigger = self._trigger(scope)
+        if trigger is None:
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self._busy = True
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        profiler = cProfile.Profile()
+        worker_profilers = []
+        token = _worker_profilers.set(worker_profilers)
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            _worker_profilers.reset(token)
+            duration = time.perf_counter() - start
+            after = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+            self._busy = False
+            self.store.add({
+                "id": uuid.uuid4().hex[:12],
+                "path": scope["path"],
+                "trigger": trigger,
+                "started_at": started_at.isoformat(),
+                "duration_ms": round(duration * 1000, 3),
+                "status": status,
+                "peak_traced_bytes": peak,
+                "allocations": _allocation_diff(before, after),
+                "cpu": _cpu_report(profiler, list(worker_profilers)),
+            })
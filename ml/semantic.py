@@ -0,0 +1,169 @@
+from array import array
+from collections import Counter
+import math
+import re
+
+import numpy as np
+
+# Local TF-IDF model for semantic recommendations; no network models.
+# Text is reduced to word features, acronyms of multi-word phrases (so
+# "machine learning" also yields "ml") and character trigrams of longer
+# words (so "cybersecurity" meets "security"). Catalog vectors are
+# L2-normalized and stored as an impact-ordered inverted index: for each
+# feature, the items carrying it sorted by weight. Cosine scores for a query
+# are accumulated with one np.bincount over the postings of its features.
+#
+# Features carried by at least an eighth of the catalog (common words and
+# trigrams) are most of a query's postings, and scattering them is most of
+# its cost. They are kept as dense float32 rows over the catalog instead,
+# at most twice the memory of their postings, and a query adds them up with
+# contiguous vector operations.
+
+_WORD_RE = re.compile(r"[a-z0-9+#]+")
+
+# Trigrams are a fallback signal for partial matches, so they count for less
+TRIGRAM_WEIGHT = 0.3
+
+def _tf(count):
+    # Sublinear term frequency; fractional trigram counts are kept as they are
+    return 1 + math.log(count) if count > 1 else count
+
+def _word_features(word):
+    features = [("w:" + word, 1)]
+    if len(word) > 4:
+        padded = f" {word} "
+        features.extend(("c:" + padded[i:i + 3], TRIGRAM_WEIGHT) for i in range(len(padded) - 2))
+    return features
+
+def extract_features(phrases):
+    features = Counter()
+    for phrase in phrases:
+        words = _WORD_RE.findall(phrase.lower())
+        for word in words:
+            for feature, count in _word_features(word):
+                features[feature] += count
+        if len(words) > 1:
+            features["w:" + "".join(word[0] for word in words)] += 1
+    return features
+
+def item_phrases(item):
+    # Tags are the most deliberate description of an activity, so they count twice
+    tags = item.get("tags", [])
+    return [item["title"], item.get("desc", "")] + tags + tags
+
+class SemanticIndex:
+    # Built once per catalog version, then read-only
+    def __init__(self, items):
+        # Catalog text repeats the same words over and over, so each word's
+        # features are worked out once. The only per-item Python work is
+        # listing feature ids; merging repeats, TF-IDF weights and norms are
+        # numpy operations over the whole catalog.
+        self.size = len(items)
+        self.vocabulary = {}
+        word_terms = {}
+        terms = array("q")
+        counts = array("d")
+        lengths = array("q")
+        for item in items:
+            start = len(terms)
+            for phrase in item_phrases(item):
+                words = _WORD_RE.findall(phrase.lower())
+                for word in words:
+                    cached = word_terms.get(word)
+                    if cached is None:
+                        features = _word_features(word)
+                        cached = word_terms[word] = (
+                            array("q", [self.vocabulary.setdefault(feature, len(self.vocabulary)) for feature, _ in features]),
+                            array("d", [count for _, count in features]),
+                        )
+                    terms.extend(cached[0])
+                    counts.extend(cached[1])
+                if len(words) > 1:
+                    acronym = "w:" + "".join(word[0] for word in words)
+                    terms.append(self.vocabulary.setdefault(acronym, len(self.vocabulary)))
+                    counts.append(1)
+            lengths.append(len(terms) - start)
+
+        # One entry per (item, feature), repeats summed in the order they occur
+        width = max(len(self.vocabulary), 1)
+        items = np.repeat(np.arange(self.size, dtype=np.int64), np.frombuffer(lengths, dtype=np.int64))
+        keys, repeats = np.unique(items * width + np.frombuffer(terms, dtype=np.int64), return_inverse=True)
+        counts = np.bincount(repeats.ravel(), weights=np.frombuffer(counts, dtype=np.float64))
+        items, terms = (column.astype(np.intp) for column in np.divmod(keys, width))
+        frequency = np.bincount(terms, minlength=len(self.vocabulary))
+        self.idf = np.log((1 + self.size) / (1 + frequency)) + 1
+        # The same sublinear term frequency as _tf
+        tf = np.where(counts > 1, 1 + np.log(counts), counts)
+        weights = tf * self.idf[terms]
+        norms = np.sqrt(np.bincount(items, weights=weights * weights, minlength=self.size))
+        weights /= np.where(norms > 0, norms, 1)[items]
+
+        # Common features become dense rows, the rest postings
+        dense_terms = np.flatnonzero(frequency * 8 >= max(self.size, 1))
+        self.dense_rows = {int(term): row for row, term in enumerate(dense_terms)}
+        row_of_term = np.full(len(self.vocabulary), -1, dtype=np.intp)
+        row_of_term[dense_terms] = np.arange(len(dense_terms))
+        rows = row_of_term[terms]
+        in_dense = rows >= 0
+        self.dense = np.zeros((len(dense_terms), self.size), dtype=np.float32)
+        self.dense[rows[in_dense], items[in_dense]] = weights[in_dense]
+        terms, items, weights = terms[~in_dense], items[~in_dense], weights[~in_dense]
+        # Group by feature, heaviest items first within each feature; weights
+        # are in (0, 1], so one sort on this key does both
+        order = np.argsort(terms + (1 - weights) / 2)
+        self.post_items = items[order]
+        self.post_weights = weights[order]
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(terms, minlength=len(self.vocabulary))))).astype(np.intp)
+
+    def query_vector(self, phrases):
+        vector = {}
+        for feature, count in extract_features(phrases).items():
+            term = self.vocabulary.get(feature)
+            if term is not None:
+                vector[term] = _tf(count) * self.idf[term]
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        return {term: w / norm for term, w in vector.items()} if norm else {}
+
+    def _split(self, vector):
+        # The query's dense rows and sparse features, with their weights
+        dense = [(self.dense_rows[term], weight) for term, weight in vector.items() if term in self.dense_rows]
+        sparse = [(term, weight) for term, weight in vector.items() if term not in self.dense_rows]
+        return dense, sparse
+
+    def scores(self, vector, max_postings=None):
+        # Dot product of every catalog item with the query vector: the dense
+        # rows are added up in float32, the postings of the sparse features
+        # with one np.bincount. With max_postings, only the highest-weighted
+        # items of each sparse feature are visited: an approximate search;
+        # the dense features are always scored in full.
+        dense, sparse = self._split(vector)
+        total = np.zeros(self.size, dtype=np.float32)
+        scaled = np.empty(self.size, dtype=np.float32)
+        for row, query_weight in dense:
+            total += np.multiply(self.dense[row], np.float32(query_weight), out=scaled)
+        scores = total.astype(np.float64)
+        items = []
+        weights = []
+        for term, query_weight in sparse:
+            start, end = self.offsets[term], self.offsets[term + 1]
+            if max_postings:
+                end = min(end, start + max_postings)
+            items.append(self.post_items[start:end])
+            weights.append(self.post_weights[start:end] * query_weight)
+        if items and self.size:
+            scores += np.bincount(np.concatenate(items), weights=np.concatenate(weights), minlength=self.size)
+        return scores
+
+    def matches(self, vector, items):
+        # Whether each of the given items shares a feature with the query,
+        # i.e. would score above zero against it on its own
+        items = np.asarray(items, dtype=np.intp)
+        dense, sparse = self._split(vector)
+        rows = [row for row, _ in dense]
+        found = (self.dense[np.ix_(rows, items)] > 0).any(axis=0)
+        if sparse and len(items):
+            marked = np.zeros(self.size, dtype=bool)
+            for term, _ in sparse:
+                marked[self.post_items[self.offsets[term]:self.offsets[term + 1]]] = True
+            found |= marked[items]
+        return found
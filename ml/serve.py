@@ -0,0 +1,83 @@
+import gc
+import os
+
+from gunicorn.app.base import BaseApplication
+from uvicorn_worker import UvicornWorker
+
+# Production server: python serve.py
+#
+# Runs the app under gunicorn with uvicorn workers (from the uvicorn-worker
+# package), one per available core by default since rendering is CPU bound. uvicorn picks uvloop and
+# httptools when they are installed (uvicorn[standard]). The app module is
+# imported in the master before forking, so compiled templates, layout CSS,
+# the catalog and its tag matrix and semantic index are built once and
+# shared copy-on-write by the workers; gc.freeze() keeps the collector from
+# touching (and so copying) those pages later.
+#
+# Workers are recycled after MAX_REQUESTS requests (plus up to 10% jitter
+# so they don't all restart at once). On SIGTERM the workers stop accepting
+# connections, finish the requests in flight and then shut down their
+# render pools, within GRACEFUL_TIMEOUT seconds.
+#
+# Caches, the co-occurrence model and /metrics are per worker, and so are
+# the render and PDF process pools; unless RENDER_WORKERS and PDF_WORKERS
+# are set, the available cores are divided among the workers' pools
+# instead of every worker starting a pool per core.
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+HOST = os.environ.get("HOST", "0.0.0.0")
+PORT = int(os.environ.get("PORT", 8000))
+WORKERS = int(os.environ.get("WEB_CONCURRENCY", 0)) or available_cores()
+MAX_REQUESTS = int(os.environ.get("MAX_REQUESTS", 10000))
+GRACEFUL_TIMEOUT = int(os.environ.get("GRACEFUL_TIMEOUT", 30))
+KEEPALIVE = int(os.environ.get("KEEPALIVE", 5))
+
+class Worker(UvicornWorker):
+    CONFIG_KWARGS = {
+        "loop": "auto",
+        "http": "auto",
+        "lifespan": "on",
+        # Leaves time for the lifespan shutdown before gunicorn kills the worker
+        "timeout_graceful_shutdown": max(GRACEFUL_TIMEOUT - 5, 1),
+    }
+
+class Server(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        import app
+        gc.collect()
+        gc.freeze()
+        return app.app
+
+def main():
+    # Before the app is imported, which reads them
+    share = max(1, available_cores() // WORKERS)
+    os.environ.setdefault("RENDER_WORKERS", str(share))
+    os.environ.setdefault("PDF_WORKERS", str(min(2, share)))
+    Server({
+        "bind": f"{HOST}:{PORT}",
+        "workers": WORKERS,
+        "worker_class": "serve.Worker",
+        "preload_app": True,
+        "max_requests": MAX_REQUESTS,
+        "max_requests_jitter": MAX_REQUESTS // 10,
+        "graceful_timeout": GRACEFUL_TIMEOUT,
+        "timeout": GRACEFUL_TIMEOUT * 2,
+        "keepalive": KEEPALIVE,
+        "accesslog": "-",
+    }).run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+class PortfolioStore:
+    # Stored portfolio requests in a local SQLite database, one JSON
+    # document per portfolio with a version that goes up on every change.
+    # Safe to share between request handlers and worker threads; several
+    # server processes can open the same file, since updates run in
+    # immediate transactions and readers check the version.
+    #
+    # It also keeps the activities of paginated portfolios for a while, by
+    # portfolio token, so any server process can answer for the fragments
+    # of a page another one rendered.
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS portfolios ("
+            "id TEXT PRIMARY KEY, version INTEGER NOT NULL, data TEXT NOT NULL, updated_at TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS portfolio_pages ("
+            "token TEXT PRIMARY KEY, layout TEXT NOT NULL, activities TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS portfolio_pages_expiry ON portfolio_pages (expires_at)")
+        self._lock = threading.Lock()
+
+    def create(self, data):
+        portfolio_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO portfolios (id, version, data, updated_at) VALUES (?, 1, ?, ?)",
+                (portfolio_id, json.dumps(data), datetime.utcnow().isoformat()),
+            )
+        return portfolio_id
+
+    def version(self, portfolio_id):
+        with self._lock:
+            row = self._conn.execute("SELECT version FROM portfolios WHERE id = ?", (portfolio_id,)).fetchone()
+        return row[0] if row else None
+
+    def get(self, portfolio_id):
+        # (version, data), or None for an unknown id
+        with self._lock:
+            row = self._conn.execute("SELECT version, data FROM portfolios WHERE id = ?", (portfolio_id,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def update(self, portfolio_id, change):
+        # Applies change(data) -> data atomically; returns (version, data),
+        # or None for an unknown id. Nothing is written if change raises.
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT version, data FROM portfolios WHERE id = ?", (portfolio_id,)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("ROLLBACK")
+                    return None
+                data = change(json.loads(row[1]))
+                version = row[0] + 1
+                self._conn.execute(
+                    "UPDATE portfolios SET version = ?, data = ?, updated_at = ? WHERE id = ?",
+                    (version, json.dumps(data), datetime.utcnow().isoformat(), portfolio_id),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return version, data
+
+    def save_pages(self, token, layout, activities, ttl):
+        # Keeps activities for ttl seconds, and drops what has expired
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM portfolio_pages WHERE expires_at < ?", (now,))
+            self._conn.execute(
+                "INSERT INTO portfolio_pages (token, layout, activities, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (token) DO UPDATE SET expires_at = excluded.expires_at",
+                (token, layout, json.dumps(activities), now + ttl),
+            )
+
+    def pages(self, token):
+        # (layout, activities), or None for an unknown or expired token
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT layout, activities FROM portfolio_pages WHERE token = ? AND expires_at >= ?",
+                (token, time.time()),
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,8 +1,31 @@
-import requests
+import argparse
+import asyncio
+import copy
 import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
 
-# FastAPI endpoint
-API_URL = "http://localhost:8000/generate_portfolio"
+import httpx
+
+# Load generator for the API. A pool of async workers shares one pooled
+# httpx client and drives /generate_portfolio, /recommendations and /health
+# with payloads varied from sample_data, at a fixed concurrency and
+# optionally a fixed request rate. Throughput and p50/p95/p99 latency are
+# reported per endpoint and can be exported as JSON.
+#
+#   python test.py --start                         start the app locally and load it
+#   python test.py --url http://host:8000 -c 64    load a running server
+#   python test.py --rate 200 --duration 30 --output results.json
+#   python test.py --write-resumes                 save the three layouts as HTML
+#
+# With --rate, latency is measured from when each request was scheduled, so
+# time spent queued behind a slow server counts against it.
+
+API_URL = "http://localhost:8000"
 
 # Sample student profile and activities data
 sample_data = {
@@ -67,81 +90,244 @@ sample_data = {
     "include_badges": True
 }
 
-def generate_resume(layout_type):
-    """Generate resume for a specific layout type"""
-    print(f"\n Generating {layout_type.upper()} resume...")
-    
-    # Add layout to the request data
-    request_data = sample_data.copy()
-    request_data["layout"] = layout_type
-    
-    try:
-        # Make POST request to FastAPI
-        response = requests.post(API_URL, json=request_data)
-        
-        if response.status_code == 200:
-            # Save HTML to file
-            filename = f"{layout_type}_resume.html"
-            with open(filename, 'w', encoding='utf-8') as f:
+LAYOUTS = ["standard", "modern", "creative"]
+
+EXTRA_SKILLS = ["java", "c++", "sql", "docker", "react", "flask", "ml", "aws", "linux", "git"]
+EXTRA_INTERESTS = ["nlp", "cloud", "ai", "data", "web", "robotics", "devops", "design"]
+
+def vary_activity(rng, index):
+    activity = copy.deepcopy(rng.choice(sample_data["activities"]))
+    activity["title"] = f"{activity['title']} {index}"
+    activity["date"] = f"20{rng.randint(22, 25)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    activity["tags"] = rng.sample(activity["tags"], rng.randint(0, len(activity["tags"])))
+    return activity
+
+def vary_profile(rng):
+    profile = copy.deepcopy(sample_data["profile"])
+    profile["name"] = f"Student {rng.randrange(100000)}"
+    profile["email"] = f"student{rng.randrange(100000)}@example.com"
+    profile["year"] = rng.randint(1, 4)
+    profile["gpa"] = round(rng.uniform(6, 10), 1)
+    profile["skills"] = rng.sample(profile["skills"] + EXTRA_SKILLS, rng.randint(1, 6))
+    profile["interests"] = rng.sample(profile["interests"] + EXTRA_INTERESTS, rng.randint(1, 4))
+    return profile
+
+def activity_count(rng):
+    # Mostly small portfolios with a long tail of large ones
+    return min(int(rng.expovariate(1 / 8)), 200)
+
+def portfolio_payload(rng):
+    return {
+        "profile": vary_profile(rng),
+        "activities": [vary_activity(rng, i) for i in range(activity_count(rng))],
+        "include_badges": True,
+        "layout": rng.choice(LAYOUTS),
+    }
+
+def recommendations_payload(rng):
+    return {
+        "profile": vary_profile(rng),
+        "activities": [vary_activity(rng, i) for i in range(rng.randint(0, 5))],
+        "num_recs": rng.randint(3, 8),
+    }
+
+ENDPOINTS = {
+    "generate_portfolio": ("POST", "/generate_portfolio", portfolio_payload),
+    "recommendations": ("POST", "/recommendations", recommendations_payload),
+    "health": ("GET", "/health", None),
+}
+
+def parse_mix(mix):
+    # "generate_portfolio=5,recommendations=4,health=1" -> {name: weight}
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r}")
+        weights[name] = float(weight or 1)
+    return weights
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * fraction // 1))
+    return sorted_values[int(rank) - 1]
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.status_codes = {}
+
+    def record(self, latency, status):
+        self.latencies.append(latency)
+        self.status_codes[status] = self.status_codes.get(status, 0) + 1
+        if status != 200:
+            self.errors += 1
+
+    def summary(self, elapsed):
+        latencies = sorted(self.latencies)
+        ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None
+        return {
+            "requests": len(latencies),
+            "errors": self.errors,
+            "status_codes": {str(code): count for code, count in sorted(self.status_codes.items(), key=str)},
+            "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+            "p50_ms": ms(percentile(latencies, 0.50)),
+            "p95_ms": ms(percentile(latencies, 0.95)),
+            "p99_ms": ms(percentile(latencies, 0.99)),
+            "max_ms": ms(latencies[-1]) if latencies else None,
+        }
+
+async def run_load(args):
+    rng = random.Random(args.seed)
+    names = list(args.mix)
+    weights = [args.mix[name] for name in names]
+    stats = {name: Stats() for name in names}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    start = time.perf_counter()
+    deadline = start + args.duration
+    sent = 0
+
+    async def worker(client):
+        nonlocal sent
+        while True:
+            if args.requests and sent >= args.requests:
+                return
+            index = sent
+            sent += 1
+            if args.rate:
+                scheduled = start + index / args.rate
+                if scheduled >= deadline:
+                    return
+                await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            else:
+                scheduled = time.perf_counter()
+                if not args.requests and scheduled >= deadline:
+                    return
+            name = rng.choices(names, weights)[0]
+            method, path, make_payload = ENDPOINTS[name]
+            payload = make_payload(rng) if make_payload else None
+            try:
+                response = await client.request(method, path, json=payload)
+                await response.aread()
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            stats[name].record(time.perf_counter() - scheduled, status)
+
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        await asyncio.gather(*[worker(client) for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - start
+    return {
+        "url": args.url,
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "duration": round(elapsed, 3),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(time.time() - elapsed)),
+        "endpoints": {name: stats[name].summary(elapsed) for name in names},
+        "total": {
+            "requests": sum(len(s.latencies) for s in stats.values()),
+            "errors": sum(s.errors for s in stats.values()),
+            "throughput": round(sum(len(s.latencies) for s in stats.values()) / elapsed, 2),
+        },
+    }
+
+def print_report(results):
+    print("=" * 86)
+    print(f" {results['url']}  concurrency={results['concurrency']}  rate={results['rate'] or 'unlimited'}  "
+          f"duration={results['duration']}s")
+    print("=" * 86)
+    print(f"  {'endpoint':20s} {'requests':>9s} {'errors':>7s} {'req/s':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'max ms':>9s}")
+    fmt = lambda value: f"{value:9.2f}" if value is not None else f"{'-':>9s}"
+    for name, s in results["endpoints"].items():
+        print(f"  {name:20s} {s['requests']:9d} {s['errors']:7d} {s['throughput']:9.2f} "
+              f"{fmt(s['p50_ms'])} {fmt(s['p95_ms'])} {fmt(s['p99_ms'])} {fmt(s['max_ms'])}")
+    total = results["total"]
+    print(f"\n  Total: {total['requests']} requests, {total['errors']} errors, {total['throughput']:.2f} req/s")
+    print("=" * 86)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_local_app():
+    # Runs app.py under uvicorn from this directory; returns (process, url)
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        if process.poll() is not None:
+            raise RuntimeError(f"App exited with status {process.returncode} during startup")
+        try:
+            httpx.get(url + "/health", timeout=1).raise_for_status()
+            return process, url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("App did not become healthy within 30 seconds")
+
+def write_resumes(url):
+    # Saves the three layouts of sample_data as <layout>_resume.html
+    with httpx.Client(base_url=url, timeout=30) as client:
+        for layout in LAYOUTS:
+            response = client.post("/generate_portfolio", json={**sample_data, "layout": layout})
+            if response.status_code != 200:
+                print(f" Error generating {layout} resume: {response.status_code}")
+                print(f"   Response: {response.text}")
+                continue
+            filename = f"{layout}_resume.html"
+            with open(filename, "w", encoding="utf-8") as f:
                 f.write(response.text)
-            print(f"{layout_type.upper()} resume saved as: {filename}")
-            return True
-        else:
-            print(f" Error generating {layout_type} resume: {response.status_code}")
-            print(f"   Response: {response.text}")
-            return False
-            
-    except requests.exceptions.ConnectionError:
-        print(f" Cannot connect to FastAPI server at {API_URL}")
-        print("   Make sure the server is running with: python app.py")
-        return False
-    except Exception as e:
-        print(f" Error: {str(e)}")
-        return False
+            print(f"{layout.upper()} resume saved as: {filename}")
 
 def main():
-    print("=" * 60)
-    print(" Resume Generator Test Script")
-    print("=" * 60)
-    print("\nThis script will generate 3 resume versions:")
-    print("  1. Standard  - Simple, traditional format")
-    print("  2. Modern    - Professional two-column layout")
-    print("  3. Creative  - Unique sidebar design with vibrant colors")
-    print("\nMake sure FastAPI server is running on http://localhost:8000")
-    print("=" * 60)
-    
-    # Generate all three versions
-    layouts = ["standard", "modern", "creative"]
-    results = {}
-    
-    for layout in layouts:
-        results[layout] = generate_resume(layout)
-    
-    # Summary
-    print("\n" + "=" * 60)
-    print("GENERATION SUMMARY")
-    print("=" * 60)
-    
-    success_count = sum(1 for v in results.values() if v)
-    
-    for layout, success in results.items():
-        status = "Success" if success else " Failed"
-        print(f"  {layout.capitalize():12s} - {status}")
-    
-    print(f"\n  Total: {success_count}/{len(layouts)} resumes generated successfully")
-    
-    if success_count == len(layouts):
-        print("\nAll resumes generated! Open the HTML files in your browser to see the differences.")
-        print("\nGenerated files:")
-        for layout in layouts:
-            print(f"   - {layout}_resume.html")
-    elif success_count > 0:
-        print("\nSome resumes were generated. Check the errors above.")
-    else:
-        print("\n No resumes were generated. Please check if FastAPI server is running.")
-        print("   Start server with: python app.py")
-    
-    print("=" * 60)
+    parser = argparse.ArgumentParser(description="Load test the resume generator API")
+    parser.add_argument("--url", default=API_URL)
+    parser.add_argument("--start", action="store_true", help="start the app locally on a free port")
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=0, help="requests per second across all workers; 0 for as fast as possible")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to run for")
+    parser.add_argument("-n", "--requests", type=int, default=0, help="stop after this many requests instead")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("generate_portfolio=5,recommendations=4,health=1"),
+                        help="endpoint weights, e.g. generate_portfolio=5,recommendations=4,health=1")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--write-resumes", action="store_true", help="save the three layouts of sample_data and exit")
+    args = parser.parse_args()
+
+    process = None
+    try:
+        if args.start:
+            process, args.url = start_local_app()
+        if args.write_resumes:
+            write_resumes(args.url)
+            return 0
+        try:
+            httpx.get(args.url + "/health", timeout=5).raise_for_status()
+        except httpx.HTTPError:
+            print(f" Cannot connect to FastAPI server at {args.url}")
+            print("   Start it with: python app.py, or pass --start")
+            return 1
+        results = asyncio.run(run_load(args))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
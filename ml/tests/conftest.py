@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The service is a set of flat modules in ml/; make them importable as they
+# are when the app runs from that directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
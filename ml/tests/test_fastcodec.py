@@ -0,0 +1,155 @@
+import copy
+import json
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+import app
+import fastcodec
+
+pytest.importorskip("msgspec")
+
+# Request bodies decoded through the msgspec structs (fastcodec) have to be
+# indistinguishable from the pydantic models FastAPI would build: the same
+# cache key and JSON dump, the same rendered HTML, and for input the structs
+# reject, the same value or the same 422 body as a plain pydantic body.
+
+SAMPLE = {
+    "profile": {
+        "name": "Ramya",
+        "email": "230878.cs@rmkec.ac.in",
+        "phone": "9876543210",
+        "college": "abc",
+        "department": "cse",
+        "year": 3,
+        "gpa": 8.5,
+        "skills": ["ethical hacking", "python", "web development"],
+        "interests": ["machine learning", "security"],
+        "summary": "Computer science student.",
+    },
+    "activities": [
+        {"type": "internship", "title": "internship", "date": "2025-11-26", "description": "INTERNSHIP", "tags": ["python"]},
+        {"type": "workshop", "title": "ML Workshop", "date": "2025-10-15", "tags": ["machine learning"]},
+        {"type": "project", "title": "E-commerce Website", "status": "pending"},
+    ],
+    "include_badges": True,
+}
+
+def variant(profile=None, activities=None, **fields):
+    data = copy.deepcopy(SAMPLE)
+    data["profile"].update(profile or {})
+    if activities is not None:
+        data["activities"] = activities
+    data.update(fields)
+    return data
+
+VALID = [
+    SAMPLE,
+    variant(profile={"email": "Ramya <Ramya.B@Example.COM>", "gpa": 9, "year": None}),
+    variant(profile={"name": "Priya D'Souza <&>", "summary": "Ünïcode & <tags>", "skills": None}),
+    variant(activities=[{"type": "x", "title": "y", "date": None, "tags": None, "description": "a < b"}]),
+    variant(activities=[], layout="modern"),
+    variant(layout="creative", include_badges=False),
+]
+
+@pytest.mark.parametrize("data", VALID)
+def test_struct_matches_model(data):
+    body = json.dumps(data).encode()
+    struct = fastcodec.msgspec.json.Decoder(fastcodec.STRUCTS["PortfolioRequest"]).decode(body)
+    model = app.PortfolioRequest.model_validate_json(body)
+
+    assert fastcodec.to_builtins(struct) == fastcodec.to_builtins(model)
+    include = {"profile", "activities"}
+    assert fastcodec.dump_json(struct, include) == fastcodec.dump_json(model, include)
+    assert app.portfolio_cache_key(struct, "day") == app.portfolio_cache_key(model, "day")
+    for layout in ("standard", "modern", "creative"):
+        assert app.generate_html_portfolio(struct.profile, struct.activities or [], layout) == (
+            app.generate_html_portfolio(model.profile, model.activities or [], layout)
+        )
+
+def echo(req):
+    return {"fast": not isinstance(req, BaseModel), "value": fastcodec.to_builtins(req)}
+
+def decoder_app():
+    # Echoes the request as body_decoder reads it, fast path on
+    decoded = FastAPI()
+
+    @decoded.post("/portfolio")
+    async def portfolio(req: app.PortfolioRequest = Depends(fastcodec.body_decoder(app.PortfolioRequest))):
+        return echo(req)
+
+    @decoded.post("/recommendations")
+    async def recommendations(req: app.RecommendationRequest = Depends(fastcodec.body_decoder(app.RecommendationRequest))):
+        return echo(req)
+
+    return decoded
+
+def pydantic_app():
+    # Echoes the request as FastAPI reads a plain pydantic body
+    plain = FastAPI()
+
+    @plain.post("/portfolio")
+    async def portfolio(req: app.PortfolioRequest):
+        return echo(req)
+
+    @plain.post("/recommendations")
+    async def recommendations(req: app.RecommendationRequest):
+        return echo(req)
+
+    return plain
+
+@pytest.fixture(scope="module")
+def clients():
+    fast_decode = fastcodec.FAST_DECODE
+    fastcodec.FAST_DECODE = True
+    try:
+        return TestClient(decoder_app()), TestClient(pydantic_app())
+    finally:
+        fastcodec.FAST_DECODE = fast_decode
+
+INPUTS = [
+    # Decoded by the structs
+    ("/portfolio", json.dumps(SAMPLE)),
+    ("/recommendations", json.dumps({"profile": SAMPLE["profile"], "num_recs": 3, "mode": "semantic"})),
+    # Malformed email
+    ("/portfolio", json.dumps(variant(profile={"email": "not-an-email"}))),
+    ("/recommendations", json.dumps(variant(profile={"email": "a@b"}))),
+    # Invalid JSON
+    ("/portfolio", "{bad"),
+    ("/portfolio", '{"profile": {"name": "x"},}'),
+    ("/recommendations", ""),
+    # Missing required fields
+    ("/portfolio", json.dumps({"activities": []})),
+    ("/portfolio", json.dumps(variant(profile={"name": None}))),
+    ("/recommendations", json.dumps({"profile": {"email": "a@b.co"}})),
+    ("/portfolio", json.dumps(variant(activities=[{"type": "x"}]))),
+    # Numbers and dates pydantic coerces or rejects
+    ("/portfolio", json.dumps(variant(profile={"year": "3", "gpa": "8.5"}))),
+    ("/portfolio", json.dumps(variant(profile={"year": 3.0, "gpa": 9}))),
+    ("/portfolio", json.dumps(variant(profile={"year": 3.5}))),
+    ("/portfolio", json.dumps(variant(profile={"year": "three"}))),
+    ("/recommendations", json.dumps({"profile": {"name": "x"}, "num_recs": "4"})),
+    ("/recommendations", json.dumps({"profile": {"name": "x"}, "num_recs": True})),
+    ("/portfolio", json.dumps(variant(activities=[{"type": "x", "title": "y", "date": 20251126}]))),
+    ("/portfolio", json.dumps(variant(activities=[{"type": "x", "title": "y", "date": "2025-13-45"}]))),
+    ("/portfolio", json.dumps(variant(activities=[{"type": "x", "title": "y", "date": ["2025-11-26"]}]))),
+]
+
+@pytest.mark.parametrize("path, body", INPUTS)
+def test_decoder_matches_pydantic_body(clients, path, body):
+    fast, plain = clients
+    got = fast.post(path, content=body, headers={"content-type": "application/json"})
+    want = plain.post(path, content=body, headers={"content-type": "application/json"})
+    assert got.status_code == want.status_code
+    if want.status_code == 200:
+        assert got.json()["value"] == want.json()["value"]
+    else:
+        assert got.status_code == 422
+        assert got.json() == want.json()
+
+def test_struct_path_is_taken(clients):
+    fast, _ = clients
+    assert fast.post("/portfolio", json=SAMPLE).json()["fast"]
+    assert not fast.post("/portfolio", json=variant(profile={"year": "3"})).json()["fast"]
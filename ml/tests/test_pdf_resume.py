@@ -0,0 +1,33 @@
+import base64
+import re
+import zlib
+
+import pytest
+
+import app
+import pdf_resume
+
+# Text from the profile is escaped for reportlab's paragraph markup; names
+# with an apostrophe used to fail in the standard layout, which upper-cased
+# the escaped name and broke its character references.
+
+NAMES = ["Priya D'Souza", "Ravi <Kumar>", "Tom & Jerry", "O'Neil <&> Sons"]
+
+def page_text(pdf):
+    # The text drawn on the pages, without the whitespace reportlab puts
+    # between words and lines
+    streams = re.findall(rb"stream\r?\n(.*?)~>endstream", pdf, re.DOTALL)
+    content = b"".join(zlib.decompress(base64.a85decode(stream)) for stream in streams)
+    return re.sub(rb"\s", b"", b"".join(re.findall(rb"\((.*?)\)\s*Tj", content))).decode("latin-1")
+
+@pytest.mark.parametrize("layout", list(pdf_resume.LAYOUT_STYLES))
+@pytest.mark.parametrize("name", NAMES)
+def test_special_characters_are_rendered(layout, name):
+    profile = app.StudentProfile(name=name, summary=f"About {name}", skills=[name])
+    activities = [app.Activity(type="project", title=name, description=name, tags=[name])]
+    pdf = pdf_resume.generate_pdf_portfolio(profile, activities, layout)
+    assert pdf.startswith(b"%PDF-")
+    text = page_text(pdf)
+    shown = name.upper() if layout == "standard" else name
+    assert shown.replace(" ", "") in text
+    assert name.replace(" ", "") in text
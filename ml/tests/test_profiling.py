@@ -0,0 +1,21 @@
+import pytest
+
+from profiling import ProfileStore, ProfilingMiddleware
+
+# An "X-Profile: 1" header only profiles a request that also carries the
+# admin token, and with no admin token configured it profiles nothing.
+
+def trigger(admin_token, headers):
+    middleware = ProfilingMiddleware(None, ProfileStore(1), ["/recommendations"], header=True, admin_token=admin_token)
+    return middleware._trigger({"headers": [(b"x-profile", b"1")] + headers})
+
+@pytest.mark.parametrize("headers", [[], [(b"x-admin-token", b"")], [(b"x-admin-token", b"anything")]])
+def test_header_ignored_without_admin_token(headers):
+    assert trigger("", headers) is None
+
+@pytest.mark.parametrize("headers", [[], [(b"x-admin-token", b"")], [(b"x-admin-token", b"secreT")]])
+def test_header_needs_matching_token(headers):
+    assert trigger("secret", headers) is None
+
+def test_header_with_matching_token():
+    assert trigger("secret", [(b"x-admin-token", b"secret")]) == "header"
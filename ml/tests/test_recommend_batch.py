@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+import app
+from cooccurrence import CooccurrenceModel
+
+# /recommendations/batch scores a whole cohort with one matrix per chunk
+# (recommend_activities_batch). Every student in it has to get exactly what
+# /recommendations would give them alone: with the co-occurrence blend on,
+# already-done titles excluded, the same student several times in one batch
+# and num_recs of none, 0, 1 or more than the catalog holds.
+
+VOCABULARY = [f"t{i}" for i in range(60)] + ["ML", "Python", "nlp"]
+TYPES = ["workshop", "internship", "project", "cert", "competition", "course", "volunteer"]
+
+def random_items(rng, n):
+    return [
+        {
+            "type": rng.choice(TYPES),
+            "title": f"Item {rng.randrange(n * 2)} {rng.choice(VOCABULARY)}",
+            "tags": rng.sample(VOCABULARY, rng.randrange(0, 4)),
+            "desc": "d",
+        }
+        for _ in range(n)
+    ]
+
+def random_request(rng, titles, n):
+    profile = {
+        "name": "x",
+        "interests": rng.sample(VOCABULARY, rng.randrange(0, 4)),
+        "skills": rng.sample(VOCABULARY, rng.randrange(0, 4)),
+        "year": rng.choice([None, 1, 2, 3, 4]),
+    }
+    activities = [{"type": "w", "title": rng.choice(titles).upper()} for _ in range(rng.randrange(0, 4))]
+    num_recs = rng.choice([None, 0, 1, 3, 6, n, n + 5])
+    return app.RecommendationRequest(profile=profile, activities=activities, num_recs=num_recs)
+
+@pytest.fixture
+def recommend_state(monkeypatch):
+    monkeypatch.setattr(app, "COOCCURRENCE_WEIGHT", 2.0)
+    monkeypatch.setattr(app, "activity_catalog", app.activity_catalog)
+    monkeypatch.setattr(app, "cooccurrence_model", app.cooccurrence_model)
+
+@pytest.mark.parametrize("seed", range(8))
+def test_batch_matches_single_student(recommend_state, monkeypatch, seed):
+    rng = random.Random(seed)
+    blended = 0
+    for n in (0, 1, 5, 8, 50, 300):
+        items = random_items(rng, n)
+        # Histories over the catalog's titles and a few outside it
+        titles = [item["title"] for item in items] + [f"Item {i} ml" for i in range(n * 2 + 1)]
+        model = CooccurrenceModel()
+        for student in range(40):
+            model.observe(student, [t.lower() for t in rng.sample(titles, rng.randrange(1, min(6, len(titles)) + 1))])
+        app.cooccurrence_model = model
+        app.activity_catalog = app.ActivityCatalog(items, version="a")
+
+        requests = [random_request(rng, titles, n) for _ in range(60)]
+        # The same students again, in another order
+        requests += rng.sample(requests, 20)
+        rng.shuffle(requests)
+        # Several chunks per batch
+        monkeypatch.setattr(app, "RECOMMEND_BATCH_ELEMENTS", rng.choice([1, 50, 4_000_000]))
+
+        results = app.recommend_activities_batch(requests)
+        assert len(results) == len(requests)
+        for req, recs in zip(requests, results):
+            assert recs == app.recommend_activities(req.profile, req.activities, req.num_recs or 6)
+            blended += sum("students like you also did this" in r["reason"] for r in recs)
+    # Enough recommendations come from the blend for it to be covered
+    assert blended > 200
@@ -0,0 +1,87 @@
+import copy
+import random
+
+import pytest
+
+import app
+from cooccurrence import CooccurrenceModel
+
+# A catalog reload keeps the cached recommendations it can't affect
+# (invalidate_recommendations). Every entry that survives a random change to
+# a random catalog has to equal a fresh recommendation against the new one,
+# with the co-occurrence blend switched on and fed by random histories.
+
+VOCABULARY = [f"t{i}" for i in range(60)] + ["ML", "Python", "nlp"]
+TYPES = ["workshop", "internship", "project", "cert", "competition", "course", "volunteer"]
+
+def random_items(rng, n):
+    return [
+        {
+            "type": rng.choice(TYPES),
+            "title": f"Item {rng.randrange(n * 2)} {rng.choice(VOCABULARY)}",
+            "tags": rng.sample(VOCABULARY, rng.randrange(0, 4)),
+            "desc": "d",
+        }
+        for _ in range(n)
+    ]
+
+def random_change(rng, items, n):
+    items = copy.deepcopy(items)
+    for _ in range(rng.randrange(1, 3)):
+        op = rng.randrange(4)
+        if op == 0 and items:
+            items.pop(rng.randrange(len(items)))
+        elif op == 1:
+            items.insert(rng.randrange(len(items) + 1), random_items(rng, n)[0])
+        elif op == 2 and items:
+            rng.choice(items)["tags"] = rng.sample(VOCABULARY, 2)
+        elif items:
+            rng.choice(items)["type"] = rng.choice(TYPES)
+    return items
+
+@pytest.fixture
+def recommend_state(monkeypatch):
+    monkeypatch.setattr(app, "COOCCURRENCE_WEIGHT", 2.0)
+    monkeypatch.setattr(app, "activity_catalog", app.activity_catalog)
+    app.recommend_cache.clear()
+    yield
+    app.recommend_cache.clear()
+
+@pytest.mark.parametrize("seed", range(12))
+def test_kept_entries_match_fresh_recommendations(recommend_state, monkeypatch, seed):
+    rng = random.Random(seed)
+    kept = 0
+    for _ in range(50):
+        n = rng.choice([5, 8, 30, 200])
+        items = random_items(rng, n)
+        # Histories over the catalog's titles and a few that aren't in it
+        # yet, so changes can add items students already co-occur with
+        titles = [item["title"].lower() for item in items] + [f"item {i} ml" for i in range(n * 2)]
+        model = CooccurrenceModel()
+        for student in range(40):
+            model.observe(student, rng.sample(titles, rng.randrange(1, min(6, len(titles)))))
+        monkeypatch.setattr(app, "cooccurrence_model", model)
+        app.recommend_cache.clear()
+        app.activity_catalog = app.ActivityCatalog(items, version="a")
+
+        cases = []
+        for _ in range(40):
+            profile = app.StudentProfile(
+                name="x",
+                interests=rng.sample(VOCABULARY, rng.randrange(0, 3)),
+                skills=rng.sample(VOCABULARY, rng.randrange(0, 3)),
+                year=rng.choice([None, 1, 3]),
+            )
+            activities = [app.Activity(type="w", title=rng.choice(titles)) for _ in range(rng.randrange(0, 3))]
+            num_recs = rng.randrange(1, 10)
+            app.cached_recommend_activities(profile, activities, num_recs)
+            cases.append((profile, activities, num_recs))
+
+        app.swap_activity_catalog(app.ActivityCatalog(random_change(rng, items, n), version="b"))
+        for profile, activities, num_recs in cases:
+            entry = app.recommend_cache.get(app.recommend_cache_key(profile, activities, num_recs))
+            if entry is not None and entry.version == "b":
+                kept += 1
+                assert entry.recommendations == app.recommend_activities(profile, activities, num_recs)
+    # Enough entries survive for the comparison to mean something
+    assert kept > 100
@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+import app
+
+# The catalog index (rank_activities) only scores items sharing a tag with
+# the profile and takes the rest from a presorted order. With the
+# co-occurrence blend off, it has to rank exactly like scoring and sorting
+# the whole catalog, which is what the endpoint did before the index.
+
+VOCABULARY = [f"t{i}" for i in range(60)] + ["ML", "Python", "nlp"]
+TYPES = ["workshop", "internship", "project", "cert", "competition", "course", "volunteer"]
+
+def random_items(rng, n):
+    return [
+        {
+            "type": rng.choice(TYPES),
+            "title": f"Item {rng.randrange(n * 2)} {rng.choice(VOCABULARY)}",
+            "tags": rng.sample(VOCABULARY, rng.randrange(0, 4)),
+            "desc": "d",
+        }
+        for _ in range(n)
+    ]
+
+def full_sort_recommendations(items, profile, past_activities, num_recs):
+    interest_set = set([t.lower() for t in (profile.interests or [])])
+    skill_set = set([s.lower() for s in (profile.skills or [])])
+    done_titles = set([a.title.lower() for a in (past_activities or [])])
+    senior = bool(profile.year and profile.year >= 3)
+
+    scores = []
+    for item in items:
+        if item["title"].lower() in done_titles:
+            continue
+        tags = set([t.lower() for t in item.get("tags", [])])
+        score = 3 * len(tags & interest_set) + 2 * len(tags & skill_set)
+        if senior and item["type"] in ["internship", "project"]:
+            score += 2
+        score += (sum(ord(c) for c in item["title"]) % 5) / 10.0
+        scores.append((score, item))
+    scores.sort(key=lambda x: x[0], reverse=True)
+
+    out = []
+    for _, r in scores[:num_recs]:
+        tags = set([t.lower() for t in r["tags"]])
+        reason_parts = []
+        if interest_set & tags:
+            reason_parts.append("matches your interests")
+        if skill_set & tags:
+            reason_parts.append("uses your skills")
+        if senior and r["type"] in ["internship", "project"]:
+            reason_parts.append("good for final-year portfolio")
+        out.append({
+            "type": r["type"],
+            "title": r["title"],
+            "tags": r["tags"],
+            "description": r["desc"],
+            "reason": "; ".join(reason_parts) if reason_parts else "recommended",
+        })
+    return out
+
+@pytest.mark.parametrize("seed", range(6))
+def test_ranking_matches_full_sort(monkeypatch, seed):
+    monkeypatch.setattr(app, "COOCCURRENCE_WEIGHT", 0)
+    monkeypatch.setattr(app, "activity_catalog", app.activity_catalog)
+    rng = random.Random(seed)
+    for n in (0, 1, 5, 8, 50, 300):
+        items = random_items(rng, n)
+        app.activity_catalog = app.ActivityCatalog(items, version="a")
+        for _ in range(100):
+            profile = app.StudentProfile(
+                name="x",
+                interests=rng.sample(VOCABULARY, rng.randrange(0, 4)),
+                skills=rng.sample(VOCABULARY, rng.randrange(0, 4)),
+                year=rng.choice([None, 1, 2, 3, 4]),
+            )
+            activities = [
+                app.Activity(type="w", title=rng.choice(items)["title"].upper())
+                for _ in range(rng.randrange(0, 3) if items else 0)
+            ]
+            num_recs = rng.choice([0, 1, 3, 6, n + 5])
+            assert app.recommend_activities(profile, activities, num_recs) == full_sort_recommendations(
+                items, profile, activities, num_recs
+            )